@@ -1,20 +1,32 @@
 import os
 import argparse
-from code import assemble
+from code import Format, assemble_stream, assemble_words, write_words
 from parse import Parser
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Assemble HACK programs.')
     parser.add_argument('input', help='Path of the ASM file.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Assemble in a single pass without keeping the program in memory.')
+    parser.add_argument('--format', choices=[f.value for f in Format], default=Format.HACK.value,
+                        help='Output format: text machine code, hex words or raw 16-bit words.')
+    parser.add_argument('--endian', choices=['little', 'big'], default='little',
+                        help='Byte order of raw 16-bit words.')
 
     args = parser.parse_args()
 
+    fmt = Format(args.format)
     in_fname = args.input
-    out_fname = f'{os.path.splitext(os.path.basename(in_fname))[0]}.hack'
+    out_fname = f'{os.path.splitext(os.path.basename(in_fname))[0]}.{fmt.value}'
 
     p = Parser(in_fname)
-    p.parse()
 
-    bin_lines = assemble(p.lines, p.sym_table)
-    with open(out_fname, 'w') as f:
-        f.write('\n'.join(bin_lines)+'\n')
+    if args.stream:
+        with open(out_fname, 'w+b') as f:
+            assemble_stream(p, f, fmt, args.endian)
+    else:
+        p.parse()
+
+        words = assemble_words(p.lines, p.sym_table)
+        with open(out_fname, 'wb') as f:
+            write_words(words, f, fmt, args.endian)
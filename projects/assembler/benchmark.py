@@ -0,0 +1,88 @@
+import os
+import random
+import argparse
+import tempfile
+import time
+from code import assemble_array, assemble_line, assemble_words, comp2bin, dest2bin, jump2bin, np
+from parse import CommandType, Line, Parser
+
+
+def assemble_line_str(line: Line, sym_table) -> str:
+    """Original string-pasting encoder, kept as the baseline.
+    """
+    if line.command_type == CommandType.ADDR:
+        if type(line.symbol) == int:
+            val = line.symbol
+        else:
+            val = sym_table[line.symbol]
+        bin_str = '{0:b}'.format(val)
+        padding = '0'*(15-len(bin_str))
+        return f'0{padding}{bin_str}'
+
+    elif line.command_type == CommandType.COMP:
+        return f'111{comp2bin[line.comp]}{dest2bin[line.dest]}{jump2bin[line.jump]}'
+
+
+def generate(f, n: int):
+    """Writes `n` random instructions to ASM file.
+    """
+    rng = random.Random(0)
+    comps = list(comp2bin)
+    dests = [d for d in dest2bin if d is not None]
+    jumps = [j for j in jump2bin if j is not None]
+    for i in range(n):
+        r = rng.random()
+        if i % 100 == 0:
+            f.write(f'(L{i})\n')
+        if r < 0.2:
+            f.write(f'@{rng.randrange(32768)}\n')
+        elif r < 0.3:
+            f.write(f'@L{rng.randrange(min(n, 32768)) // 100 * 100}\n')
+        elif r < 0.4:
+            f.write(f'@var{rng.randrange(200)}\n')
+        elif r < 0.9:
+            f.write(f'{rng.choice(dests)}={rng.choice(comps)}\n')
+        else:
+            f.write(f'{rng.choice(comps)};{rng.choice(jumps)}\n')
+
+
+def timed(name: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f'{name:<24}{time.perf_counter() - start:8.3f} s')
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark string and integer encoding paths.')
+    parser.add_argument('-n', type=int, default=1000000,
+                        help='Number of instructions to generate.')
+
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.asm')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            generate(f, args.n)
+
+        p = Parser(path)
+        timed('parse', p.parse)
+
+        old = timed('string (old)', lambda: [
+            assemble_line_str(l, p.sym_table) for l in p.lines
+        ])
+        new = timed('string (table)', lambda: [
+            assemble_line(l, p.sym_table) for l in p.lines
+        ])
+        words = timed('array(H)', assemble_words, p.lines, p.sym_table)
+        assert old == new and [int(w, 2) for w in old] == list(words)
+
+        if np is not None:
+            packed = timed('numpy uint16', assemble_array,
+                           p.lines, p.sym_table)
+            assert packed.tolist() == list(words)
+        else:
+            print('numpy uint16            skipped (NumPy not installed)')
+    finally:
+        os.remove(path)
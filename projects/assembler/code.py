@@ -1,5 +1,12 @@
-from parse import CommandType, Line
-from typing import Dict, List
+import sys
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from enum import Enum
+from parse import CommandType, Line, Parser
+from typing import BinaryIO, Dict, List
 
 
 comp2bin = {
@@ -59,6 +66,38 @@ jump2bin = {
 }
 
 
+comp2int = {k: int(v, 2) for k, v in comp2bin.items()}
+dest2int = {k: int(v, 2) for k, v in dest2bin.items()}
+jump2int = {k: int(v, 2) for k, v in jump2bin.items()}
+
+# Complete C-instruction encodings keyed by (dest, comp, jump)
+triple2int = {
+    (dest, comp, jump): 0xE000 | c << 6 | d << 3 | j
+    for comp, c in comp2int.items()
+    for dest, d in dest2int.items()
+    for jump, j in jump2int.items()
+}
+
+# Binary digits of every byte, used to format words as machine code text
+byte2bin = [f'{b:08b}' for b in range(256)]
+
+
+class Format(str, Enum):
+    """Machine code output format
+    """
+    HACK = 'hack'
+    HEX = 'hex'
+    BIN = 'bin'
+
+
+# Width in bytes of one word in each format, including newline
+format2width = {
+    Format.HACK: 17,
+    Format.HEX: 5,
+    Format.BIN: 2,
+}
+
+
 def assemble(lines: List[Line], sym_table: Dict[str, int]) -> List[str]:
     """Assemble lines to machine code list
     """
@@ -68,14 +107,127 @@ def assemble(lines: List[Line], sym_table: Dict[str, int]) -> List[str]:
 def assemble_line(line: Line, sym_table: Dict[str, int]) -> str:
     """Assemble single line to machine code
     """
+    word = assemble_word(line, sym_table)
+    return byte2bin[word >> 8] + byte2bin[word & 0xFF]
+
+
+def assemble_words(lines: List[Line], sym_table: Dict[str, int]) -> array:
+    """Assemble lines to packed array of machine words
+    """
+    return array('H', [assemble_word(l, sym_table) for l in lines])
+
+
+def assemble_array(lines: List[Line], sym_table: Dict[str, int]):
+    """Assemble lines to NumPy uint16 array of machine words
+    """
+    if np is None:
+        raise RuntimeError('NumPy is required to assemble to an array.')
+    # Resolve each instruction to an index into a table of distinct words so
+    # the words themselves are materialized in a single vectorized gather.
+    keys = {}
+    idxs = np.fromiter(
+        (keys.setdefault(_line_key(l, sym_table), len(keys)) for l in lines),
+        dtype=np.uint32, count=len(lines),
+    )
+    table = np.fromiter(
+        (k if type(k) == int else triple2int[k] for k in keys),
+        dtype=np.uint16, count=len(keys),
+    )
+    return table[idxs]
+
+
+def assemble_word(line: Line, sym_table: Dict[str, int]) -> int:
+    """Assemble single line to machine word
+    """
+    if line.command_type == CommandType.COMP:
+        return triple2int[(line.dest, line.comp, line.jump)]
+
+    elif line.command_type == CommandType.ADDR:
+        if type(line.symbol) == int:
+            return line.symbol
+        return sym_table[line.symbol]
+
+
+def _line_key(line: Line, sym_table: Dict[str, int]):
     if line.command_type == CommandType.ADDR:
         if type(line.symbol) == int:
-            val = line.symbol
+            return line.symbol
+        return sym_table[line.symbol]
+    return (line.dest, line.comp, line.jump)
+
+
+def encode_word(word: int, fmt: Format, byteorder: str = 'little') -> bytes:
+    """Encode single machine word in output format
+    """
+    if fmt == Format.HACK:
+        return f'{word:016b}\n'.encode()
+    elif fmt == Format.HEX:
+        return f'{word:04x}\n'.encode()
+    elif fmt == Format.BIN:
+        return word.to_bytes(2, byteorder)
+
+
+def decode_word(data: bytes, fmt: Format, byteorder: str = 'little') -> int:
+    """Decode single machine word from output format
+    """
+    if fmt == Format.HACK:
+        return int(data[:16], 2)
+    elif fmt == Format.HEX:
+        return int(data[:4], 16)
+    elif fmt == Format.BIN:
+        return int.from_bytes(data, byteorder)
+
+
+def write_words(words: array, out_f: BinaryIO, fmt: Format, byteorder: str = 'little'):
+    """Write packed machine words to binary file in output format
+    """
+    if fmt == Format.HACK:
+        out_f.write(''.join([
+            f'{byte2bin[w >> 8]}{byte2bin[w & 0xFF]}\n' for w in words
+        ]).encode())
+    elif fmt == Format.HEX:
+        out_f.write(''.join([f'{w:04x}\n' for w in words]).encode())
+    elif fmt == Format.BIN:
+        if byteorder != sys.byteorder:
+            words = array('H', words)
+            words.byteswap()
+        words.tofile(out_f)
+
+
+def assemble_stream(p: Parser, out_f: BinaryIO, fmt: Format = Format.HACK, byteorder: str = 'little') -> int:
+    """Assemble lines streamed from parser directly into a seekable binary file.
+    Returns number of words written.
+
+    References to symbols that are not yet defined are written as placeholders
+    and patched after the whole file has been read. Each placeholder holds the
+    position of the previous reference to the same symbol (plus one), so the
+    fixup table only needs the last reference of every pending symbol.
+    """
+    width = format2width[fmt]
+    fixups = {}
+    n_words = 0
+    for line in p.stream():
+        if line.command_type == CommandType.ADDR and type(line.symbol) != int and line.symbol not in p.sym_table:
+            # Forward reference: chain to previous reference of symbol
+            link = fixups.get(line.symbol, -1) + 1
+            if link > 0xFFFF:
+                raise ValueError('Program too large to assemble in streaming mode.')
+            fixups[line.symbol] = n_words
+            out_f.write(encode_word(link, fmt, byteorder))
         else:
-            val = sym_table[line.symbol]
-        bin_str = '{0:b}'.format(val)
-        padding = '0'*(15-len(bin_str))
-        return f'0{padding}{bin_str}'
+            out_f.write(encode_word(assemble_word(line, p.sym_table), fmt, byteorder))
+        n_words += 1
+
+    # Patch forward references. Symbols are kept in order of first reference,
+    # so those that never became labels are allocated as variables in order.
+    for symbol, idx in fixups.items():
+        word = encode_word(p.resolve(symbol), fmt, byteorder)
+        while idx >= 0:
+            out_f.seek(idx*width)
+            link = decode_word(out_f.read(width), fmt, byteorder)
+            out_f.seek(idx*width)
+            out_f.write(word)
+            idx = link - 1
+    out_f.seek(0, 2)
 
-    elif line.command_type == CommandType.COMP:
-        return f'111{comp2bin[line.comp]}{dest2bin[line.dest]}{jump2bin[line.jump]}'
+    return n_words
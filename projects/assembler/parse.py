@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Iterable, Iterator, Optional
 
 
 class CommandType(Enum):
@@ -61,12 +62,14 @@ class Parser:
             'KBD': 24576,
         }
 
-        with open(self.fname, 'r') as f:
-            self.__raw_lines = [l.strip() for l in f.read().split('\n')]
-
-    def parse(self):
-        """Parses machine code lines and symbol table from loaded file
+    def parse(self, lines: Optional[Iterable[str]] = None):
+        """Parses machine code lines and symbol table from loaded file, or
+        from `lines` if given
         """
+        if lines is None:
+            with open(self.fname, 'r') as f:
+                lines = f.read().split('\n')
+        self.__raw_lines = [l.strip() for l in lines]
 
         # First pass: add labels to table
         for l in self.__raw_lines:
@@ -100,17 +103,50 @@ class Parser:
                 # Comp
                 self.lines.append(self.__parse_comp(l))
 
-    def __parse_addr(self, addr: str) -> Line:
+    def stream(self) -> Iterator[Line]:
+        """Parses machine code lines in a single pass over the file.
+
+        Labels are added to the symbol table as they are encountered. Address
+        symbols are yielded unresolved and no variables are allocated, since a
+        symbol may still turn out to be a label defined further down.
+        """
+        with open(self.fname, 'r') as f:
+            for l in f:
+                l = l.strip()
+                if len(l) == 0 or len(l) >= 2 and l[0:2] == '//':
+                    # No-op
+                    pass
+                elif l[0] == '@':
+                    # Address
+                    self.prg_idx += 1
+                    yield self.__parse_addr(l[1:], allocate=False)
+                elif l[0] == '(' and l[-1] == ')':
+                    # Label
+                    label = l[1:len(l)-1]
+                    self.sym_table[label] = self.prg_idx
+                else:
+                    # Comp
+                    self.prg_idx += 1
+                    yield self.__parse_comp(l)
+
+    def __parse_addr(self, addr: str, allocate: bool = True) -> Line:
         if addr.isdigit():
             symbol = int(addr)
         else:
             symbol = addr
             # Add new symbol to table
-            if symbol not in self.sym_table:
-                self.sym_table[symbol] = self.var_idx
-                self.var_idx += 1
+            if allocate:
+                self.resolve(symbol)
         return Line(command_type=CommandType.ADDR, symbol=symbol)
 
+    def resolve(self, symbol: str) -> int:
+        """Returns address of symbol, allocating a new variable if it is undefined.
+        """
+        if symbol not in self.sym_table:
+            self.sym_table[symbol] = self.var_idx
+            self.var_idx += 1
+        return self.sym_table[symbol]
+
     def __parse_comp(self, line: str) -> Line:
         eq_idx = line.find('=')
         semi_idx = line.find(';')
@@ -0,0 +1,50 @@
+import io
+import os
+import glob
+import time
+import argparse
+from tokenizer import TokenBuffer, Tokenizer
+
+projects_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def count_tokens(text: str, lookahead: bool = False) -> int:
+    """Tokenizes text and returns number of tokens.
+    """
+    f = io.StringIO(text)
+    t = TokenBuffer(f) if lookahead else Tokenizer(f)
+    n = 0
+    t.advance()
+    while t.has_more:
+        n += 1
+        t.advance()
+    return n
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark tokenizer on the OS and the programs of project 11.')
+    parser.add_argument('-n', '--repeat', type=int, default=5,
+                        help='Number of runs, the fastest is reported.')
+    parser.add_argument('--lookahead', action='store_true',
+                        help='Read tokens from a token buffer.')
+
+    args = parser.parse_args()
+
+    fnames = sorted(glob.glob(os.path.join(projects_dir, '12', '*.jack'))) + \
+        sorted(glob.glob(os.path.join(projects_dir, '11', '*', '*.jack')))
+    texts = []
+    for fname in fnames:
+        with open(fname, 'r') as f:
+            texts.append(f.read())
+    text = '\n'.join(texts)
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        n_tokens = count_tokens(text, args.lookahead)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f'files: {len(fnames)} chars: {len(text)} tokens: {n_tokens}')
+    print(f'time: {best*1000:.1f} ms ({n_tokens/best:.0f} tokens/s)')
@@ -0,0 +1,309 @@
+from typing import List, Optional, TextIO
+from engine import CompilerException, kind2seg
+from nodes import (ArrayRef, BinaryOp, Call, Class, Do, If, IntConst, KeywordConst,
+                   Let, Node, Return, Shift, StringConst, Subroutine, UnaryOp, VarRef,
+                   While)
+from symbol_table import IdentifierKind, Symbol, SymbolTable
+from tokenizer import Keyword
+from writer import Command, Segment, VMWriter
+
+keyword2kind = {
+    Keyword.STATIC: IdentifierKind.STATIC,
+    Keyword.FIELD: IdentifierKind.FIELD,
+    Keyword.VAR: IdentifierKind.VAR,
+}
+
+op2cmd = {
+    '+': Command.ADD,
+    '-': Command.SUB,
+    '&': Command.AND,
+    '|': Command.OR,
+    '<': Command.LT,
+    '>': Command.GT,
+    '=': Command.EQ,
+}
+
+
+def find_strings(node) -> List[str]:
+    """Returns string literals in a node, list of nodes or their children.
+    """
+    if isinstance(node, StringConst):
+        return [node.value]
+    if isinstance(node, list):
+        children = node
+    elif isinstance(node, Node):
+        children = [getattr(node, name) for name in node.__slots__]
+    else:
+        return []
+    return [value for child in children for value in find_strings(child)]
+
+
+class CodeGenerator:
+    """Generates VM code from the syntax tree of a Jack class, emitting the
+    same code as `CompilationEngine`. Like it, the code is written to `out_f`
+    when the class is done, or kept in memory for `getvalue`.
+
+    If `interned` is set, each distinct string literal is built only once, by
+    a `<Class>.$strings` function that stores all literals of the class in
+    static variables after the declared ones. Subroutines using literals call
+    it on entry until it has run, and every use pushes the same `String`
+    object, so literals must not be changed or disposed.
+    """
+
+    def __init__(self, out_f: Optional[TextIO], interned: bool = False):
+        self.__writer = VMWriter(out_f)
+        self.__symbol_table = SymbolTable()
+        self.__class_name = None
+        self.__return_type = None
+        self.__labels = {}
+        self.__interned = interned
+        # Static index of each interned literal
+        self.__strings = {}
+
+    def generate_class(self, cls: Class):
+        """Generates code for class.
+        """
+        self.__class_name = cls.name
+        for dec in cls.class_vars:
+            for name in dec.names:
+                self.__symbol_table.define(name, dec.type, keyword2kind[dec.kind])
+        for subroutine in cls.subroutines:
+            self.generate_subroutine(subroutine)
+        if self.__strings:
+            self.generate_strings()
+        self.__writer.flush()
+
+    def getvalue(self) -> str:
+        """Returns generated code if there is no output file.
+        """
+        return self.__writer.getvalue()
+
+    def generate_subroutine(self, subroutine: Subroutine):
+        """Generates code for subroutine.
+        """
+        self.__symbol_table.start_subroutine()
+        self.__return_type = subroutine.return_type
+
+        # Add dummy self as first parameter if method
+        if subroutine.kind == Keyword.METHOD:
+            self.__symbol_table.define('this', self.__class_name, IdentifierKind.ARGUMENT)
+        for param in subroutine.params:
+            self.__symbol_table.define(param.names[0], param.type, IdentifierKind.ARGUMENT)
+        for dec in subroutine.locals:
+            for name in dec.names:
+                self.__symbol_table.define(name, dec.type, IdentifierKind.VAR)
+
+        n_locals = self.__symbol_table.var_count(IdentifierKind.VAR)
+        self.__writer.write_function(f'{self.__class_name}.{subroutine.name}', n_locals)
+        if self.__interned:
+            self.__write_strings_check(find_strings(subroutine.statements))
+
+        if subroutine.kind == Keyword.CONSTRUCTOR:
+            # Allocate memory for object if constructor
+            n_fields = self.__symbol_table.var_count(IdentifierKind.FIELD)
+            self.__writer.write_push(Segment.CONST, n_fields)
+            self.__writer.write_call('Memory.alloc', 1)
+            self.__writer.write_pop(Segment.POINTER, 0)
+        elif subroutine.kind == Keyword.METHOD:
+            # Copy arg0 to pointer0
+            self.__writer.write_push(Segment.ARG, 0)
+            self.__writer.write_pop(Segment.POINTER, 0)
+
+        self.generate_statements(subroutine.statements)
+
+    def generate_strings(self):
+        """Generates function that builds interned string literals.
+        """
+        self.__writer.write_function(f'{self.__class_name}.$strings', 0)
+        for value, index in self.__strings.items():
+            self.__write_string(value)
+            self.__writer.write_pop(Segment.STATIC, index)
+        self.__writer.write_push(Segment.CONST, 0)
+        self.__writer.write_return()
+
+    def generate_statements(self, statements: List[Node]):
+        """Generates code for statements.
+        """
+        for statement in statements:
+            if isinstance(statement, Let):
+                self.generate_let(statement)
+            elif isinstance(statement, If):
+                self.generate_if(statement)
+            elif isinstance(statement, While):
+                self.generate_while(statement)
+            elif isinstance(statement, Do):
+                self.generate_call(statement.call)
+                # Ignore returned value
+                self.__writer.write_pop(Segment.TEMP, 0)
+            elif isinstance(statement, Return):
+                if statement.value is not None:
+                    self.generate_expression(statement.value)
+                # Return 0 if void return type
+                if self.__return_type == Keyword.VOID:
+                    self.__writer.write_push(Segment.CONST, 0)
+                self.__writer.write_return()
+
+    def generate_let(self, let: Let):
+        if let.index is not None:
+            self.generate_expression(let.index)
+        self.generate_expression(let.value)
+
+        v = self.__find(let.name)
+        if let.index is not None:
+            # Indexing, load value into array
+            self.__writer.write_pop(Segment.TEMP, 0)
+            self.__writer.write_push(kind2seg[v.kind], v.index)
+            self.__writer.write_arithmetic(Command.ADD)
+            self.__writer.write_pop(Segment.POINTER, 1)
+            self.__writer.write_push(Segment.TEMP, 0)
+            self.__writer.write_pop(Segment.THAT, 0)
+        else:
+            self.__writer.write_pop(kind2seg[v.kind], v.index)
+
+    def generate_if(self, stmt: If):
+        else_label = self.__generate_label('ELSE')
+        endif_label = self.__generate_label('ENDIF')
+
+        self.generate_expression(stmt.cond)
+        self.__writer.write_arithmetic(Command.NOT)
+        self.__writer.write_if(else_label)
+        self.generate_statements(stmt.then)
+        self.__writer.write_goto(endif_label)
+        self.__writer.write_label(else_label)
+        if stmt.orelse is not None:
+            self.generate_statements(stmt.orelse)
+        self.__writer.write_label(endif_label)
+
+    def generate_while(self, stmt: While):
+        loop_label = self.__generate_label('LOOP')
+        endloop_label = self.__generate_label('ENDLOOP')
+
+        self.__writer.write_label(loop_label)
+        self.generate_expression(stmt.cond)
+        self.__writer.write_arithmetic(Command.NOT)
+        self.__writer.write_if(endloop_label)
+        self.generate_statements(stmt.body)
+        self.__writer.write_goto(loop_label)
+        self.__writer.write_label(endloop_label)
+
+    def generate_call(self, call: Call):
+        """Generates code for subroutine call, leaving the result on the stack.
+        """
+        if call.target is None:
+            # Guaranteed to be a method. Push address of `this` stack.
+            self.__writer.write_push(Segment.POINTER, 0)
+            name = f'{self.__class_name}.{call.name}'
+            n_args = len(call.args) + 1
+        else:
+            v = self.__symbol_table.find(call.target)
+            if v is None:
+                # Not in symbol table, class name
+                name = f'{call.target}.{call.name}'
+                n_args = len(call.args)
+            else:
+                # Was in symbol table, var name
+                name = f'{v.type}.{call.name}'
+                self.__writer.write_push(kind2seg[v.kind], v.index)
+                n_args = len(call.args) + 1
+        for arg in call.args:
+            self.generate_expression(arg)
+        self.__writer.write_call(name, n_args)
+
+    def generate_expression(self, expr: Node):
+        """Generates code for expression, leaving its value on the stack.
+        """
+        if isinstance(expr, IntConst):
+            self.__writer.write_push(Segment.CONST, expr.value)
+
+        elif isinstance(expr, StringConst):
+            if self.__interned:
+                self.__writer.write_push(Segment.STATIC, self.__strings[expr.value])
+            else:
+                self.__write_string(expr.value)
+
+        elif isinstance(expr, KeywordConst):
+            if expr.keyword in [Keyword.FALSE, Keyword.NULL]:
+                self.__writer.write_push(Segment.CONST, 0)
+            elif expr.keyword == Keyword.TRUE:
+                self.__writer.write_push(Segment.CONST, 0)
+                self.__writer.write_arithmetic(Command.NOT)
+            elif expr.keyword == Keyword.THIS:
+                self.__writer.write_push(Segment.POINTER, 0)
+
+        elif isinstance(expr, VarRef):
+            v = self.__find(expr.name)
+            self.__writer.write_push(kind2seg[v.kind], v.index)
+
+        elif isinstance(expr, ArrayRef):
+            self.generate_expression(expr.index)
+            # Point to target location and push value
+            v = self.__find(expr.name)
+            self.__writer.write_push(kind2seg[v.kind], v.index)
+            self.__writer.write_arithmetic(Command.ADD)
+            self.__writer.write_pop(Segment.POINTER, 1)
+            self.__writer.write_push(Segment.THAT, 0)
+
+        elif isinstance(expr, Call):
+            self.generate_call(expr)
+
+        elif isinstance(expr, UnaryOp):
+            self.generate_expression(expr.operand)
+            if expr.op == '-':
+                self.__writer.write_arithmetic(Command.NEG)
+            elif expr.op == '~':
+                self.__writer.write_arithmetic(Command.NOT)
+
+        elif isinstance(expr, Shift):
+            self.generate_expression(expr.operand)
+            for _ in range(expr.count):
+                # Double value through temp 1, which nothing else uses
+                self.__writer.write_pop(Segment.TEMP, 1)
+                self.__writer.write_push(Segment.TEMP, 1)
+                self.__writer.write_push(Segment.TEMP, 1)
+                self.__writer.write_arithmetic(Command.ADD)
+
+        elif isinstance(expr, BinaryOp):
+            self.generate_expression(expr.left)
+            self.generate_expression(expr.right)
+            if expr.op == '*':
+                self.__writer.write_call('Math.multiply', 2)
+            elif expr.op == '/':
+                self.__writer.write_call('Math.divide', 2)
+            else:
+                self.__writer.write_arithmetic(op2cmd[expr.op])
+
+    def __write_string(self, value: str):
+        self.__writer.write_push(Segment.CONST, len(value))
+        self.__writer.write_call('String.new', 1)
+        for c in value:
+            self.__writer.write_push(Segment.CONST, ord(c))
+            self.__writer.write_call('String.appendChar', 2)
+
+    def __write_strings_check(self, values: List[str]):
+        if not values:
+            return
+        n_statics = self.__symbol_table.var_count(IdentifierKind.STATIC)
+        for value in values:
+            if value not in self.__strings:
+                self.__strings[value] = n_statics + len(self.__strings)
+
+        # Literals are all set at once, so any unset one means none are
+        built_label = self.__generate_label('STRINGS')
+        self.__writer.write_push(Segment.STATIC, self.__strings[values[0]])
+        self.__writer.write_if(built_label)
+        self.__writer.write_call(f'{self.__class_name}.$strings', 0)
+        self.__writer.write_pop(Segment.TEMP, 0)
+        self.__writer.write_label(built_label)
+
+    def __find(self, name: str) -> Symbol:
+        v = self.__symbol_table.find(name)
+        if v is None:
+            raise CompilerException(f'No declaration found for `{name}`.')
+        return v
+
+    def __generate_label(self, prefix: str = 'LBL') -> str:
+        if prefix in self.__labels:
+            self.__labels[prefix] += 1
+        else:
+            self.__labels[prefix] = 0
+        return f'{prefix}_{self.__labels[prefix]}'
@@ -1,25 +1,85 @@
 import os
 import argparse
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional
+from codegen import CodeGenerator
 from engine import CompilationEngine
+from fold import fold_class
+from parser import Parser
+from tokenizer import TokenBuffer
 
 
-def compile(path: str, in_fnames: List[str]):
-    """Translate list of Jack files in directory `path` to VM files.
+def compile_file(path: str, fname: str, lookahead: bool = False,
+                 use_ast: bool = False, folded: bool = False,
+                 interned: bool = False) -> Optional[str]:
+    """Compiles Jack file in directory `path` to a VM file, through a syntax
+    tree if `use_ast`, `folded` or `interned` is set. Constant expressions in
+    the tree are evaluated if `folded` is set, and string literals are built
+    once per class if `interned` is set. The output is written to a temporary file first
+    and only replaces the VM file once compilation succeeded. Returns error
+    message or None.
     """
-    for fname in in_fnames:
-        in_path = os.path.join(path, f'{fname}.jack')
+    in_path = os.path.join(path, f'{fname}.jack')
+    out_path = os.path.join(path, f'{fname}.vm')
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    try:
         with open(in_path, 'r') as in_f:
-            out_path = os.path.join(path, f'{fname}.vm')
-            with open(out_path, 'w') as out_f:
-                c = CompilationEngine(in_f=in_f, out_f=out_f)
-                c.compile_class()
+            with open(tmp_path, 'w') as out_f:
+                if use_ast or folded or interned:
+                    tree = Parser(TokenBuffer(in_f)).parse_class()
+                    if folded:
+                        fold_class(tree)
+                    CodeGenerator(out_f, interned).generate_class(tree)
+                else:
+                    c = CompilationEngine(in_f=in_f, out_f=out_f, lookahead=lookahead)
+                    c.compile_class()
+        os.replace(tmp_path, out_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return f'{fname}.jack: {e}'
+    return None
+
+
+def compile(path: str, in_fnames: List[str], lookahead: bool = False,
+            jobs: int = 1, use_ast: bool = False, folded: bool = False,
+            interned: bool = False) -> List[str]:
+    """Translate list of Jack files in directory `path` to VM files.
+    Tokenizes each file into a token buffer first if `lookahead` is set and
+    parses it into a syntax tree before generating code if `use_ast` is set.
+    Folds constants and reduces multiplications in the tree if `folded` is set,
+    and interns string literals if `interned` is set.
+    Compiles files in `jobs` processes if more than one. Returns error
+    messages of the files that failed.
+    """
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            errors = list(executor.map(
+                compile_file, repeat(path), in_fnames, repeat(lookahead), repeat(use_ast),
+                repeat(folded), repeat(interned)))
+    else:
+        errors = [compile_file(path, fname, lookahead, use_ast, folded, interned)
+                  for fname in in_fnames]
+    return [error for error in errors if error is not None]
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Compile Jack programs to VM.')
     parser.add_argument('input', help='Path of the program/directory.')
+    parser.add_argument('--lookahead', action='store_true',
+                        help='Tokenize each file into a token buffer first.')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of files to compile in parallel.')
+    parser.add_argument('--ast', action='store_true',
+                        help='Parse into a syntax tree before generating code.')
+    parser.add_argument('--fold', action='store_true',
+                        help='Fold constant expressions and reduce multiplications '
+                        'by constants. Implies --ast.')
+    parser.add_argument('--intern-strings', action='store_true',
+                        help='Build each distinct string literal of a class once and '
+                        'reuse it. Implies --ast.')
 
     args = parser.parse_args()
 
@@ -42,4 +102,9 @@ if __name__ == '__main__':
         # File
         in_fnames.append(fname)
 
-    compile(path, in_fnames)
+    errors = compile(path, in_fnames, args.lookahead, args.jobs, args.ast, args.fold,
+                     args.intern_strings)
+    for error in errors:
+        print(f'error: {error}')
+    if errors:
+        exit(1)
@@ -1,6 +1,6 @@
 from symbol_table import IdentifierKind, SymbolTable
-from typing import TextIO
-from tokenizer import Keyword, TokenType, Tokenizer
+from typing import Optional, TextIO
+from tokenizer import Keyword, TokenBuffer, TokenType, Tokenizer
 from writer import Command, Segment, VMWriter
 
 
@@ -17,17 +17,20 @@ kind2seg = {
 
 
 class CompilationEngine:
-    """Compilation engine that compiles Jack code to VM code.
+    """Compilation engine that compiles Jack code to VM code. The code is
+    written to `out_f` at once when the class is done, or kept in memory for
+    `getvalue` if there is no output file.
     """
 
-    def __init__(self, in_f: TextIO, out_f: TextIO):
+    def __init__(self, in_f: TextIO, out_f: Optional[TextIO], lookahead: bool = False):
         self.__out_f = out_f
         self.__writer = VMWriter(out_f)
         self.__symbol_table = SymbolTable()
         self.__class_name = None
         self.__return_type = None
         self.__labels = {}
-        self.__tokenizer = Tokenizer(in_f)
+        # Token buffer tokenizes the whole file up front
+        self.__tokenizer = TokenBuffer(in_f) if lookahead else Tokenizer(in_f)
         self.__tokenizer.advance()
 
     def compile_class(self):
@@ -58,6 +61,12 @@ class CompilationEngine:
         if not (self.__tokenizer.token_type == TokenType.SYMBOL and self.__tokenizer.symbol == '}'):
             raise CompilerException('Expected `}`')
         self.__tokenizer.advance()
+        self.__writer.flush()
+
+    def getvalue(self) -> str:
+        """Returns compiled code if there is no output file.
+        """
+        return self.__writer.getvalue()
 
     def compile_class_var_dec(self):
         """Compiles class variables declaration.
@@ -314,9 +323,8 @@ class CompilationEngine:
                 raise CompilerException(
                     f'`No declaration for {var_name}` was found.'
                 )
-            var_type, var_kind, var_idx = v
             self.__writer.write_pop(Segment.TEMP, 0)
-            self.__writer.write_push(kind2seg[var_kind], var_idx)
+            self.__writer.write_push(kind2seg[v.kind], v.index)
             self.__writer.write_arithmetic(Command.ADD)
             self.__writer.write_pop(Segment.POINTER, 1)
             self.__writer.write_push(Segment.TEMP, 0)
@@ -329,8 +337,7 @@ class CompilationEngine:
                 raise CompilerException(
                     f'No declaration found for `{var_name}`.'
                 )
-            var_type, var_kind, var_idx = v
-            self.__writer.write_pop(kind2seg[var_kind], var_idx)
+            self.__writer.write_pop(kind2seg[v.kind], v.index)
 
     def compile_if(self):
         """Compiles if statement.
@@ -475,9 +482,8 @@ class CompilationEngine:
                 n_args = self.compile_expression_list()
             else:
                 # Was in symbol table, var name
-                var_type, var_kind, var_idx = v
-                subroutine_name = f'{var_type}.{subroutine_name}'
-                self.__writer.write_push(kind2seg[var_kind], var_idx)
+                subroutine_name = f'{v.type}.{subroutine_name}'
+                self.__writer.write_push(kind2seg[v.kind], v.index)
                 n_args = self.compile_expression_list() + 1
 
             if not (self.__tokenizer.token_type == TokenType.SYMBOL and self.__tokenizer.symbol == ')'):
@@ -599,8 +605,7 @@ class CompilationEngine:
                     raise CompilerException(
                         f'`No declaration for {id_name}` was found.'
                     )
-                var_type, var_kind, var_idx = v
-                self.__writer.write_push(kind2seg[var_kind], var_idx)
+                self.__writer.write_push(kind2seg[v.kind], v.index)
                 self.__writer.write_arithmetic(Command.ADD)
                 self.__writer.write_pop(Segment.POINTER, 1)
                 self.__writer.write_push(Segment.THAT, 0)
@@ -641,9 +646,8 @@ class CompilationEngine:
                     n_args = self.compile_expression_list()
                 else:
                     # Was in symbol table, var name
-                    var_type, var_kind, var_idx = v
-                    subroutine_name = f'{var_type}.{subroutine_name}'
-                    self.__writer.write_push(kind2seg[var_kind], var_idx)
+                    subroutine_name = f'{v.type}.{subroutine_name}'
+                    self.__writer.write_push(kind2seg[v.kind], v.index)
                     n_args = self.compile_expression_list() + 1
 
                 if not (self.__tokenizer.token_type == TokenType.SYMBOL and self.__tokenizer.symbol == ')'):
@@ -659,8 +663,7 @@ class CompilationEngine:
                 if v == None:
                     raise CompilerException(
                         f'No declaration found for `{var_name}`.')
-                var_type, var_kind, var_idx = v
-                self.__writer.write_push(kind2seg[var_kind], var_idx)
+                self.__writer.write_push(kind2seg[v.kind], v.index)
 
         elif self.__tokenizer.token_type == TokenType.SYMBOL and self.__tokenizer.symbol == '(':
             # Parenthesis-wrapped expression
@@ -0,0 +1,217 @@
+from typing import List, Optional
+from nodes import (ArrayRef, BinaryOp, Call, Class, Do, If, IntConst, KeywordConst,
+                   Let, Node, Return, Shift, UnaryOp, VarRef, While)
+from tokenizer import Keyword
+
+keyword2value = {
+    Keyword.TRUE: -1,
+    Keyword.FALSE: 0,
+    Keyword.NULL: 0,
+}
+
+
+def wrap(x: int) -> int:
+    """Wraps integer to signed 16-bit.
+    """
+    return ((x + 0x8000) & 0xFFFF) - 0x8000
+
+
+def const_value(expr: Node) -> Optional[int]:
+    """Returns value of a constant expression, None if not constant.
+    """
+    if isinstance(expr, IntConst):
+        return wrap(expr.value)
+    if isinstance(expr, KeywordConst):
+        return keyword2value.get(expr.keyword)
+    if isinstance(expr, UnaryOp):
+        value = const_value(expr.operand)
+        if value is not None:
+            return wrap(-value) if expr.op == '-' else ~value
+    return None
+
+
+def const_node(value: int) -> Node:
+    """Returns shortest expression for a 16-bit value.
+    """
+    if value >= 0:
+        return IntConst(value)
+    if value == -0x8000:
+        return UnaryOp('~', IntConst(0x7FFF))
+    return UnaryOp('-', IntConst(-value))
+
+
+def is_pure(expr: Node) -> bool:
+    """Whether expression has no calls, so it can be dropped or repeated.
+    """
+    if isinstance(expr, Call):
+        return False
+    if isinstance(expr, ArrayRef):
+        return is_pure(expr.index)
+    if isinstance(expr, (UnaryOp, Shift)):
+        return is_pure(expr.operand)
+    if isinstance(expr, BinaryOp):
+        return is_pure(expr.left) and is_pure(expr.right)
+    return True
+
+
+def eval_binary(op: str, x: int, y: int) -> Optional[int]:
+    """Evaluates operator like the VM and the OS do, None if it must be left
+    to run time.
+    """
+    if op == '+':
+        return wrap(x + y)
+    if op == '-':
+        return wrap(x - y)
+    if op == '*':
+        return wrap(x * y)
+    if op == '/':
+        # Division by zero is reported by the OS, and abs(-32768) overflows
+        if y == 0 or x == -0x8000 or y == -0x8000:
+            return None
+        q = abs(x) // abs(y)
+        return q if (x < 0) == (y < 0) else -q
+    if op == '&':
+        return x & y
+    if op == '|':
+        return x | y
+    if op == '<':
+        return -(x < y)
+    if op == '>':
+        return -(x > y)
+    if op == '=':
+        return -(x == y)
+    return None
+
+
+def power_of_two(value: int) -> int:
+    """Returns k if value is 2**k with k > 0, otherwise 0.
+    """
+    if value > 1 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return 0
+
+
+def multiply(expr: Node, value: int) -> Optional[Node]:
+    """Returns `expr` times a constant without calling Math.multiply, or None.
+    """
+    if value == 0 and is_pure(expr):
+        return IntConst(0)
+    if value == 1:
+        return expr
+    if value == -1:
+        return UnaryOp('-', expr)
+
+    negate = value < 0
+    count = power_of_two(-value if negate else value)
+    if count == 0:
+        return None
+    if isinstance(expr, VarRef):
+        # Variables are cheap to push twice
+        doubled = BinaryOp('+', expr, VarRef(expr.name))
+        product = doubled if count == 1 else Shift(doubled, count - 1)
+    else:
+        product = Shift(expr, count)
+    return UnaryOp('-', product) if negate else product
+
+
+def fold_binary(expr: BinaryOp) -> Node:
+    op = expr.op
+    left = fold_expression(expr.left)
+    right = fold_expression(expr.right)
+    x = const_value(left)
+    y = const_value(right)
+
+    if x is not None and y is not None:
+        value = eval_binary(op, x, y)
+        if value is not None:
+            return const_node(value)
+
+    if op == '*':
+        product = None
+        if y is not None:
+            product = multiply(left, y)
+        elif x is not None:
+            product = multiply(right, x)
+        if product is not None:
+            return product
+    elif op == '/':
+        if y == 1:
+            return left
+        if y == -1:
+            return UnaryOp('-', left)
+    elif op in '+-' and y is not None:
+        # Combine offsets of (e + c1) + c2 and the like
+        offset = y if op == '+' else wrap(-y)
+        if isinstance(left, BinaryOp) and left.op in '+-':
+            inner = const_value(left.right)
+            if inner is not None:
+                offset = wrap(offset + (inner if left.op == '+' else -inner))
+                left = left.left
+        if offset == 0:
+            return left
+        if offset < 0 and offset != -0x8000:
+            return BinaryOp('-', left, IntConst(-offset))
+        return BinaryOp('+', left, const_node(offset))
+    elif op == '+' and x == 0:
+        return right
+    elif op == '-' and x == 0:
+        return UnaryOp('-', right)
+    elif op == '&' and (x == -1 or y == -1):
+        return right if x == -1 else left
+    elif op == '|' and (x == 0 or y == 0):
+        return right if x == 0 else left
+    return BinaryOp(op, left, right)
+
+
+def fold_expression(expr: Node) -> Node:
+    """Returns expression with constant sub-expressions evaluated and
+    multiplications by constants reduced.
+    """
+    if isinstance(expr, BinaryOp):
+        return fold_binary(expr)
+    if isinstance(expr, UnaryOp):
+        operand = fold_expression(expr.operand)
+        if isinstance(operand, UnaryOp) and operand.op == expr.op:
+            # Both negation and bitwise not cancel out
+            return operand.operand
+        folded = UnaryOp(expr.op, operand)
+        value = const_value(folded)
+        return const_node(value) if value is not None else folded
+    if isinstance(expr, ArrayRef):
+        expr.index = fold_expression(expr.index)
+    elif isinstance(expr, Call):
+        expr.args = [fold_expression(arg) for arg in expr.args]
+    elif isinstance(expr, Shift):
+        expr.operand = fold_expression(expr.operand)
+    return expr
+
+
+def fold_statements(statements: List[Node]):
+    """Folds expressions of statements in place.
+    """
+    for statement in statements:
+        if isinstance(statement, Let):
+            if statement.index is not None:
+                statement.index = fold_expression(statement.index)
+            statement.value = fold_expression(statement.value)
+        elif isinstance(statement, If):
+            statement.cond = fold_expression(statement.cond)
+            fold_statements(statement.then)
+            if statement.orelse is not None:
+                fold_statements(statement.orelse)
+        elif isinstance(statement, While):
+            statement.cond = fold_expression(statement.cond)
+            fold_statements(statement.body)
+        elif isinstance(statement, Do):
+            fold_expression(statement.call)
+        elif isinstance(statement, Return):
+            if statement.value is not None:
+                statement.value = fold_expression(statement.value)
+
+
+def fold_class(cls: Class) -> Class:
+    """Folds expressions in all subroutines of class in place.
+    """
+    for subroutine in cls.subroutines:
+        fold_statements(subroutine.statements)
+    return cls
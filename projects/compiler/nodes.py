@@ -0,0 +1,174 @@
+from typing import List, Optional, Union
+from tokenizer import Keyword
+
+# Builtin types are keywords, class types are identifiers
+Type = Union[Keyword, str]
+
+
+class Node:
+    """Node of a Jack syntax tree.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+# Expressions
+
+class IntConst(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: int):
+        self.value = value
+
+
+class StringConst(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class KeywordConst(Node):
+    """`true`, `false`, `null` or `this`.
+    """
+    __slots__ = ('keyword',)
+
+    def __init__(self, keyword: Keyword):
+        self.keyword = keyword
+
+
+class VarRef(Node):
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class ArrayRef(Node):
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name: str, index: Node):
+        self.name = name
+        self.index = index
+
+
+class Call(Node):
+    """Subroutine call. `target` is a variable or class name, or None for
+    methods of the current object.
+    """
+    __slots__ = ('target', 'name', 'args')
+
+    def __init__(self, target: Optional[str], name: str, args: List[Node]):
+        self.target = target
+        self.name = name
+        self.args = args
+
+
+class UnaryOp(Node):
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op: str, operand: Node):
+        self.op = op
+        self.operand = operand
+
+
+class BinaryOp(Node):
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op: str, left: Node, right: Node):
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+class Shift(Node):
+    """`operand` times 2**`count`, computed by repeated addition.
+    """
+    __slots__ = ('operand', 'count')
+
+    def __init__(self, operand: Node, count: int):
+        self.operand = operand
+        self.count = count
+
+
+# Statements
+
+class Let(Node):
+    """Assignment to variable `name`, or to `name[index]` if index is set.
+    """
+    __slots__ = ('name', 'index', 'value')
+
+    def __init__(self, name: str, index: Optional[Node], value: Node):
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class If(Node):
+    __slots__ = ('cond', 'then', 'orelse')
+
+    def __init__(self, cond: Node, then: List[Node], orelse: Optional[List[Node]]):
+        self.cond = cond
+        self.then = then
+        self.orelse = orelse
+
+
+class While(Node):
+    __slots__ = ('cond', 'body')
+
+    def __init__(self, cond: Node, body: List[Node]):
+        self.cond = cond
+        self.body = body
+
+
+class Do(Node):
+    __slots__ = ('call',)
+
+    def __init__(self, call: Call):
+        self.call = call
+
+
+class Return(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, value: Optional[Node]):
+        self.value = value
+
+
+# Declarations
+
+class VarDec(Node):
+    """Declaration of static or field variables, locals, or a parameter
+    with no kind.
+    """
+    __slots__ = ('kind', 'type', 'names')
+
+    def __init__(self, kind: Optional[Keyword], type: Type, names: List[str]):
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class Subroutine(Node):
+    __slots__ = ('kind', 'return_type', 'name', 'params', 'locals', 'statements')
+
+    def __init__(self, kind: Keyword, return_type: Type, name: str,
+                 params: List[VarDec], locals: List[VarDec], statements: List[Node]):
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.params = params
+        self.locals = locals
+        self.statements = statements
+
+
+class Class(Node):
+    __slots__ = ('name', 'class_vars', 'subroutines')
+
+    def __init__(self, name: str, class_vars: List[VarDec], subroutines: List[Subroutine]):
+        self.name = name
+        self.class_vars = class_vars
+        self.subroutines = subroutines
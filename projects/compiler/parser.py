@@ -0,0 +1,247 @@
+from typing import List, Optional
+from engine import CompilerException
+from nodes import (ArrayRef, BinaryOp, Call, Class, Do, If, IntConst, KeywordConst,
+                   Let, Node, Return, StringConst, Subroutine, Type, UnaryOp, VarDec,
+                   VarRef, While)
+from tokenizer import Keyword, TokenBuffer, TokenType
+
+builtin_types = [Keyword.INT, Keyword.CHAR, Keyword.BOOLEAN]
+keyword_consts = [Keyword.TRUE, Keyword.FALSE, Keyword.NULL, Keyword.THIS]
+statement_keywords = [Keyword.LET, Keyword.IF, Keyword.WHILE, Keyword.DO, Keyword.RETURN]
+
+
+class Parser:
+    """Parses Jack class from a token buffer into a syntax tree.
+    """
+
+    def __init__(self, tokens: TokenBuffer):
+        self.__tokens = tokens
+        self.__tokens.advance()
+
+    def parse_class(self) -> Class:
+        """Parses class.
+        """
+        self.__expect_keyword(Keyword.CLASS)
+        name = self.__expect_identifier()
+        self.__expect_symbol('{')
+
+        class_vars = []
+        while self.__is_keyword(Keyword.STATIC, Keyword.FIELD):
+            kind = self.__tokens.keyword
+            self.__tokens.advance()
+            class_vars.append(self.parse_var_dec(kind))
+
+        subroutines = []
+        while self.__is_keyword(Keyword.CONSTRUCTOR, Keyword.FUNCTION, Keyword.METHOD):
+            subroutines.append(self.parse_subroutine())
+
+        self.__expect_symbol('}')
+        return Class(name, class_vars, subroutines)
+
+    def parse_var_dec(self, kind: Keyword) -> VarDec:
+        """Parses type and names of a variable declaration after its kind.
+        """
+        var_type = self.__expect_type()
+        names = [self.__expect_identifier()]
+        while self.__is_symbol(','):
+            self.__tokens.advance()
+            names.append(self.__expect_identifier())
+        self.__expect_symbol(';')
+        return VarDec(kind, var_type, names)
+
+    def parse_subroutine(self) -> Subroutine:
+        """Parses subroutine declaration.
+        """
+        kind = self.__tokens.keyword
+        self.__tokens.advance()
+        return_type = self.__expect_type(Keyword.VOID)
+        name = self.__expect_identifier()
+
+        self.__expect_symbol('(')
+        params = []
+        if not self.__is_symbol(')'):
+            params.append(self.parse_param())
+            while self.__is_symbol(','):
+                self.__tokens.advance()
+                params.append(self.parse_param())
+        self.__expect_symbol(')')
+
+        self.__expect_symbol('{')
+        local_vars = []
+        while self.__is_keyword(Keyword.VAR):
+            self.__tokens.advance()
+            local_vars.append(self.parse_var_dec(Keyword.VAR))
+        statements = self.parse_statements()
+        self.__expect_symbol('}')
+        return Subroutine(kind, return_type, name, params, local_vars, statements)
+
+    def parse_param(self) -> VarDec:
+        """Parses parameter type and name.
+        """
+        var_type = self.__expect_type()
+        return VarDec(None, var_type, [self.__expect_identifier()])
+
+    def parse_statements(self) -> List[Node]:
+        """Parses statements up to the end of the block.
+        """
+        statements = []
+        while self.__is_keyword(*statement_keywords):
+            keyword = self.__tokens.keyword
+            self.__tokens.advance()
+            if keyword == Keyword.LET:
+                statements.append(self.parse_let())
+            elif keyword == Keyword.IF:
+                statements.append(self.parse_if())
+            elif keyword == Keyword.WHILE:
+                statements.append(self.parse_while())
+            elif keyword == Keyword.DO:
+                statements.append(Do(self.parse_call(self.__expect_identifier())))
+                self.__expect_symbol(';')
+            else:
+                value = None
+                if not self.__is_symbol(';'):
+                    value = self.parse_expression()
+                self.__expect_symbol(';')
+                statements.append(Return(value))
+        return statements
+
+    def parse_let(self) -> Let:
+        name = self.__expect_identifier()
+        index = None
+        if self.__is_symbol('['):
+            self.__tokens.advance()
+            index = self.parse_expression()
+            self.__expect_symbol(']')
+        self.__expect_symbol('=')
+        value = self.parse_expression()
+        self.__expect_symbol(';')
+        return Let(name, index, value)
+
+    def parse_if(self) -> If:
+        cond = self.__parse_condition()
+        then = self.__parse_block()
+        orelse = None
+        if self.__is_keyword(Keyword.ELSE):
+            self.__tokens.advance()
+            orelse = self.__parse_block()
+        return If(cond, then, orelse)
+
+    def parse_while(self) -> While:
+        cond = self.__parse_condition()
+        return While(cond, self.__parse_block())
+
+    def parse_call(self, name: str) -> Call:
+        """Parses rest of a subroutine call after its first identifier.
+        """
+        target = None
+        if self.__is_symbol('.'):
+            self.__tokens.advance()
+            target = name
+            name = self.__expect_identifier()
+        elif not self.__is_symbol('('):
+            raise CompilerException('Expected either symbol `(` or `.`.')
+
+        self.__expect_symbol('(')
+        args = []
+        if not self.__is_symbol(')'):
+            args.append(self.parse_expression())
+            while self.__is_symbol(','):
+                self.__tokens.advance()
+                args.append(self.parse_expression())
+        self.__expect_symbol(')')
+        return Call(target, name, args)
+
+    def parse_expression(self) -> Node:
+        """Parses expression. Operators have no precedence and are applied
+        from left to right.
+        """
+        expr = self.parse_term()
+        while self.__tokens.token_type == TokenType.SYMBOL and self.__tokens.symbol in '+-*/&|<>=':
+            op = self.__tokens.symbol
+            self.__tokens.advance()
+            expr = BinaryOp(op, expr, self.parse_term())
+        return expr
+
+    def parse_term(self) -> Node:
+        """Parses term.
+        """
+        tokens = self.__tokens
+        token_type = tokens.token_type
+        if token_type == TokenType.INT_CONST:
+            term = IntConst(int(tokens.int_val))
+            tokens.advance()
+        elif token_type == TokenType.STRING_CONST:
+            term = StringConst(tokens.string_val)
+            tokens.advance()
+        elif token_type == TokenType.KEYWORD and tokens.keyword in keyword_consts:
+            term = KeywordConst(tokens.keyword)
+            tokens.advance()
+        elif token_type == TokenType.IDENTIFIER:
+            # Decide by the token after the identifier
+            next_type, next_value = tokens.peek()
+            name = tokens.identifier
+            tokens.advance()
+            if next_type == TokenType.SYMBOL and next_value == '[':
+                tokens.advance()
+                term = ArrayRef(name, self.parse_expression())
+                self.__expect_symbol(']')
+            elif next_type == TokenType.SYMBOL and next_value in '(.':
+                term = self.parse_call(name)
+            else:
+                term = VarRef(name)
+        elif self.__is_symbol('('):
+            tokens.advance()
+            term = self.parse_expression()
+            self.__expect_symbol(')')
+        elif token_type == TokenType.SYMBOL and tokens.symbol in '-~':
+            op = tokens.symbol
+            tokens.advance()
+            term = UnaryOp(op, self.parse_term())
+        else:
+            raise CompilerException('Expected a term.')
+        return term
+
+    def __parse_condition(self) -> Node:
+        self.__expect_symbol('(')
+        cond = self.parse_expression()
+        self.__expect_symbol(')')
+        return cond
+
+    def __parse_block(self) -> List[Node]:
+        self.__expect_symbol('{')
+        statements = self.parse_statements()
+        self.__expect_symbol('}')
+        return statements
+
+    def __is_keyword(self, *keywords: Keyword) -> bool:
+        return self.__tokens.token_type == TokenType.KEYWORD and self.__tokens.keyword in keywords
+
+    def __is_symbol(self, symbol: str) -> bool:
+        return self.__tokens.token_type == TokenType.SYMBOL and self.__tokens.symbol == symbol
+
+    def __expect_keyword(self, keyword: Keyword):
+        if not self.__is_keyword(keyword):
+            raise CompilerException(f'Expected keyword `{keyword.value}`.')
+        self.__tokens.advance()
+
+    def __expect_symbol(self, symbol: str):
+        if not self.__is_symbol(symbol):
+            raise CompilerException(f'Expected symbol `{symbol}`.')
+        self.__tokens.advance()
+
+    def __expect_identifier(self) -> str:
+        if self.__tokens.token_type != TokenType.IDENTIFIER:
+            raise CompilerException('Expected valid identifier.')
+        name = self.__tokens.identifier
+        self.__tokens.advance()
+        return name
+
+    def __expect_type(self, extra: Optional[Keyword] = None) -> Type:
+        if self.__is_keyword(*builtin_types, extra):
+            var_type = self.__tokens.keyword
+        elif self.__tokens.token_type == TokenType.IDENTIFIER:
+            var_type = self.__tokens.identifier
+        else:
+            raise CompilerException('Expected valid type.')
+        self.__tokens.advance()
+        return var_type
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Tuple, Union
+from typing import Dict, Optional
 
 
 class IdentifierKind(str, Enum):
@@ -11,13 +11,45 @@ class IdentifierKind(str, Enum):
     VAR = 'var'
 
 
+class Symbol:
+    """Declared identifier.
+    """
+    __slots__ = ('type', 'kind', 'index')
+
+    def __init__(self, type: str, kind: IdentifierKind, index: int):
+        self.type = type
+        self.kind = kind
+        self.index = index
+
+    def __repr__(self):
+        return f'Symbol({self.type}, {self.kind.value}, {self.index})'
+
+
+class Scope:
+    """Identifiers declared in a class or subroutine, looked up in the
+    enclosing scope if not found.
+    """
+    __slots__ = ('symbols', 'parent')
+
+    def __init__(self, parent: Optional['Scope'] = None):
+        self.symbols: Dict[str, Symbol] = {}
+        self.parent = parent
+
+
+# Kinds declared in class scope, the others are declared in subroutine scope
+class_kinds = {IdentifierKind.STATIC, IdentifierKind.FIELD}
+
+
 class SymbolTable:
     """Class and subroutine symbol table.
+
+    Subroutine scope is chained to class scope, so lookups are a dict access
+    per scope. Counts of each kind are kept as identifiers are declared.
     """
 
     def __init__(self):
-        self.__class_table = {}
-        self.__subroutine_table = {}
+        self.__class_scope = Scope()
+        self.__subroutine_scope = Scope(self.__class_scope)
         self.__counters = {
             IdentifierKind.STATIC: 0,
             IdentifierKind.FIELD: 0,
@@ -28,40 +60,29 @@ class SymbolTable:
     def start_subroutine(self):
         """Erases current subroutine scope and starts new subroutine scope.
         """
-        self.__subroutine_table = {}
+        self.__subroutine_scope = Scope(self.__class_scope)
         self.__counters[IdentifierKind.ARGUMENT] = 0
         self.__counters[IdentifierKind.VAR] = 0
 
     def define(self, name: str, type: str, kind: IdentifierKind):
         """Declare new identifier.
         """
-        if kind in [IdentifierKind.STATIC, IdentifierKind.FIELD]:
-            # Class scope
-            self.__class_table[name] = (
-                type, kind, self.__counters[kind]
-            )
-        elif kind in [IdentifierKind.ARGUMENT, IdentifierKind.VAR]:
-            # Subroutine scope
-            self.__subroutine_table[name] = (
-                type, kind, self.__counters[kind]
-            )
+        scope = self.__class_scope if kind in class_kinds else self.__subroutine_scope
+        scope.symbols[name] = Symbol(type, kind, self.__counters[kind])
         self.__counters[kind] += 1
 
     def var_count(self, kind: IdentifierKind) -> int:
         """Returns number of variables declared with the specified kind.
         """
-        return sum(kind == k for _, k, _ in self.__class_table.values()) + \
-            sum(kind == k for _, k, _ in self.__subroutine_table.values())
+        return self.__counters[kind]
 
-    def find(self, name: str) -> Union[Tuple[str, IdentifierKind, int], None]:
-        """Finds (type, kind, idx) tuple for identifier. Returns None if no identifier found.
+    def find(self, name: str) -> Optional[Symbol]:
+        """Finds symbol of identifier. Returns None if no identifier found.
         """
-        # Search subroutine scope
-        for n, v in self.__subroutine_table.items():
-            if n == name:
-                return v
-        # Search class scope
-        for n, v in self.__class_table.items():
-            if n == name:
-                return v
+        scope = self.__subroutine_scope
+        while scope is not None:
+            symbol = scope.symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
         return None
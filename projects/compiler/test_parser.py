@@ -0,0 +1,24 @@
+import io
+import unittest
+from engine import CompilerException
+from parser import Parser
+from tokenizer import TokenBuffer
+
+
+def parse(text: str):
+    return Parser(TokenBuffer(io.StringIO(text))).parse_class()
+
+
+class ParamTest(unittest.TestCase):
+
+    def test_param_types(self):
+        tree = parse('class Main { function int f(int x, Array y) { return x; } }')
+        self.assertEqual(len(tree.subroutines[0].params), 2)
+
+    def test_void_param_rejected(self):
+        with self.assertRaises(CompilerException):
+            parse('class Main { function int f(void x) { return 0; } }')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
+import re
+from array import array
 from enum import Enum, auto
-from typing import TextIO
+from typing import Any, Dict, List, Optional, TextIO, Tuple
 
 
 class TokenType(Enum):
@@ -38,8 +40,38 @@ class Keyword(str, Enum):
     THIS = 'this'
 
 
+# Whitespace and comments, or a single token, tried at the cursor. Words are
+# matched whole and split into keywords and identifiers afterwards
+token_re = re.compile(r'''
+    (?P<skip>(?:\s+|//[^\n]*|/\*.*?(?:\*/|\Z))+)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<symbol>[{}()\[\].,;+\-*/&|<>=~])
+    | (?P<int>[0-9]+)
+    | "(?P<string>[^"\n]*)"
+''', re.VERBOSE | re.DOTALL)
+
+word2keyword = {keyword.value: keyword for keyword in Keyword}
+
+# Token types by their value, as stored in token buffers
+code2type = {token_type.value: token_type for token_type in TokenType}
+kind2code = {
+    'word': TokenType.IDENTIFIER.value,
+    'symbol': TokenType.SYMBOL.value,
+    'int': TokenType.INT_CONST.value,
+    'string': TokenType.STRING_CONST.value,
+}
+KEYWORD_CODE = TokenType.KEYWORD.value
+IDENTIFIER_CODE = TokenType.IDENTIFIER.value
+
+
+class TokenizerException(Exception):
+    pass
+
+
 class Tokenizer:
     """Tokenizes Jack code.
+
+    Scans the text once with a regex from an integer cursor.
     """
 
     def __init__(self, f: TextIO):
@@ -51,6 +83,7 @@ class Tokenizer:
         self.int_val = None
         self.string_val = None
         self.__text = f.read()
+        self.__pos = 0
 
     def advance(self):
         self.token_type = None
@@ -60,109 +93,141 @@ class Tokenizer:
         self.int_val = None
         self.string_val = None
 
-        is_comment = True
-        while is_comment:
+        text = self.__text
+        pos = self.__pos
+        m = token_re.match(text, pos)
+        if m is not None and m.lastgroup == 'skip':
+            pos = m.end()
+            m = token_re.match(text, pos)
+
+        if m is None:
+            if pos < len(text):
+                raise TokenizerException(f'Unexpected character: {text[pos]!r}')
             # Exits at end of tokens
-            if len(self.__text) == 0:
-                self.has_more = False
-                return
-
-            # Remove comments
-            self.__text = self.__text.strip()
-            is_comment = self.__remove_comment()
-            self.__text = self.__text.strip()
-
-        # Detect all possible
-        keyword = self.__detect_keyword()
-        symbol = self.__detect_symbol()
-        int_val = self.__detect_int()
-        string_val = self.__detect_string()
-        identifier = self.__detect_identifier()
-
-        longest = max(keyword, symbol, int_val,
-                      string_val, identifier, key=len)
-
-        # Prefer longest text matched
-        if longest == keyword:
-            self.token_type = TokenType.KEYWORD
-            self.keyword = keyword
-            self.__text = self.__text[len(longest):]
-        elif longest == symbol:
+            self.has_more = False
+            return
+        self.__pos = m.end()
+
+        kind = m.lastgroup
+        if kind == 'word':
+            word = m.group(kind)
+            keyword = word2keyword.get(word)
+            if keyword is not None:
+                self.token_type = TokenType.KEYWORD
+                self.keyword = keyword
+            else:
+                self.token_type = TokenType.IDENTIFIER
+                self.identifier = word
+        elif kind == 'symbol':
             self.token_type = TokenType.SYMBOL
-            self.symbol = symbol
-            self.__text = self.__text[len(longest):]
-        elif longest == int_val:
+            self.symbol = m.group(kind)
+        elif kind == 'int':
             self.token_type = TokenType.INT_CONST
-            self.int_val = int_val
-            self.__text = self.__text[len(longest):]
-        elif longest == string_val:
+            self.int_val = m.group(kind)
+        else:
             self.token_type = TokenType.STRING_CONST
-            self.string_val = string_val
-            self.__text = self.__text[len(longest)+2:]
-        elif longest == identifier:
-            self.token_type = TokenType.IDENTIFIER
-            self.identifier = identifier
-            self.__text = self.__text[len(longest):]
-
-    def __detect_keyword(self) -> str:
-        for keyword in Keyword:
-            if len(self.__text) >= len(keyword) and self.__text[:len(keyword)] == keyword:
-                return keyword
-        return ''
-
-    def __detect_symbol(self) -> str:
-        if len(self.__text) >= 1 and self.__text[0] in '{}()[].,;+-*/&|<>=~':
-            return self.__text[0]
-        return ''
-
-    def __detect_int(self) -> str:
-        p = 0
-        acc = ''
-        while p < len(self.__text) and self.__text[p].isdigit():
-            acc += self.__text[p]
-            p += 1
-        return acc
-
-    def __detect_string(self) -> str:
-        p = 0
-        acc = ''
-        if self.__text[p] == '"':
-            p += 1
-            while p < len(self.__text) and self.__text[p] != '"':
-                acc += self.__text[p]
-                p += 1
-            p += 1
-        return acc
-
-    def __detect_identifier(self) -> str:
-        p = 0
-        acc = ''
-        while p < len(self.__text) and self.__text[p].isidentifier():
-            acc += self.__text[p]
-            p += 1
-        return acc
-
-    def __remove_comment(self) -> bool:
-        # Remove single-line comment
-        p = 0
-        if len(self.__text) >= 2 and self.__text[:2] == '//':
-            p += 2
-            while p < len(self.__text) and self.__text[p] != '\n':
-                p += 1
-            p += 1
-            self.__text = self.__text[p:]
-            return True
-
-        # Remove multi-line comment and doc comment
-        p = 0
-        if len(self.__text) >= 2 and self.__text[:2] == '/*':
-            p += 2
-            while p < len(self.__text):
-                p += 1
-                if len(self.__text[p:]) >= 2 and self.__text[p:p+2] == '*/':
-                    break
-            p += 2
-            self.__text = self.__text[p:]
-            return True
-
-        return False
+            self.string_val = m.group(kind)
+
+
+class TokenBuffer:
+    """Whole Jack file tokenized up front into parallel arrays of token types,
+    start and end offsets and indices into a table of interned values.
+
+    Reading works like `Tokenizer`, with the attributes of the current token
+    looked up on access, and `peek` gives the tokens after it.
+    """
+
+    def __init__(self, f: TextIO):
+        self.text = f.read()
+        self.types = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.value_ids = array('I')
+        self.values: List[Any] = []
+        self.__pos = -1
+        self.__scan()
+
+    def __scan(self):
+        text = self.text
+        value2id: Dict[Tuple[int, Any], int] = {}
+        values = self.values
+        types_append = self.types.append
+        starts_append = self.starts.append
+        ends_append = self.ends.append
+        value_ids_append = self.value_ids.append
+        pos = 0
+        for m in token_re.finditer(text):
+            start = m.start()
+            if start != pos:
+                raise TokenizerException(f'Unexpected character: {text[pos]!r}')
+            pos = m.end()
+            kind = m.lastgroup
+            if kind == 'skip':
+                continue
+
+            value = m.group(kind)
+            code = kind2code[kind]
+            if code == IDENTIFIER_CODE and value in word2keyword:
+                code = KEYWORD_CODE
+                value = word2keyword[value]
+
+            # Same text of different types, like keyword `class` and string
+            # "class", is interned separately
+            key = (code, value)
+            value_id = value2id.get(key)
+            if value_id is None:
+                value_id = value2id[key] = len(values)
+                values.append(value)
+            types_append(code)
+            starts_append(start)
+            ends_append(pos)
+            value_ids_append(value_id)
+        if pos != len(text):
+            raise TokenizerException(f'Unexpected character: {text[pos]!r}')
+
+    @property
+    def has_more(self) -> bool:
+        return self.__pos < len(self.types)
+
+    def advance(self):
+        if self.__pos < len(self.types):
+            self.__pos += 1
+
+    def peek(self, k: int = 1) -> Tuple[Optional[TokenType], Any]:
+        """Returns type and value of the token `k` places after the current
+        one, or (None, None) past the end.
+        """
+        i = self.__pos + k
+        if not 0 <= i < len(self.types):
+            return None, None
+        return code2type[self.types[i]], self.values[self.value_ids[i]]
+
+    def __value(self, token_type: TokenType) -> Any:
+        i = self.__pos
+        if 0 <= i < len(self.types) and self.types[i] == token_type.value:
+            return self.values[self.value_ids[i]]
+        return None
+
+    @property
+    def token_type(self) -> Optional[TokenType]:
+        return self.peek(0)[0]
+
+    @property
+    def keyword(self) -> Optional[Keyword]:
+        return self.__value(TokenType.KEYWORD)
+
+    @property
+    def symbol(self) -> Optional[str]:
+        return self.__value(TokenType.SYMBOL)
+
+    @property
+    def identifier(self) -> Optional[str]:
+        return self.__value(TokenType.IDENTIFIER)
+
+    @property
+    def int_val(self) -> Optional[str]:
+        return self.__value(TokenType.INT_CONST)
+
+    @property
+    def string_val(self) -> Optional[str]:
+        return self.__value(TokenType.STRING_CONST)
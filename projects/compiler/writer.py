@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import TextIO
+from typing import Optional, TextIO
 
 
 class Segment(str, Enum):
@@ -29,54 +29,78 @@ class Command(str, Enum):
     NOT = 'not'
 
 
+# Command text is formatted once instead of through the enums on every write
+push_text = {segment: f'push {segment.value} ' for segment in Segment}
+pop_text = {segment: f'pop {segment.value} ' for segment in Segment}
+command_text = {command: f'{command.value}\n' for command in Command}
+
+
 class VMWriter:
     """VM code writer.
+
+    Lines are kept in `lines` until `flush` writes them all at once to the
+    output file. Without an output file, the code stays in memory and can be
+    read with `getvalue`.
     """
 
-    def __init__(self, out_f: TextIO):
+    def __init__(self, out_f: Optional[TextIO] = None):
         self.__out_f = out_f
+        self.lines = []
+        self.__write = self.lines.append
 
     def write_push(self, segment: Segment, idx: int):
         """Writes push.
         """
-        self.__out_f.write(f'push {segment} {idx}\n')
+        self.__write(f'{push_text[segment]}{idx}\n')
 
     def write_pop(self, segment: Segment, idx: int):
         """Writes pop.
         """
-        self.__out_f.write(f'pop {segment} {idx}\n')
+        self.__write(f'{pop_text[segment]}{idx}\n')
 
     def write_arithmetic(self, command: Command):
         """Writes arithmetic command.
         """
-        self.__out_f.write(f'{command}\n')
+        self.__write(command_text[command])
 
     def write_label(self, label: str):
         """Writes label.
         """
-        self.__out_f.write(f'label {label}\n')
+        self.__write(f'label {label}\n')
 
     def write_goto(self, label: str):
         """Writes goto.
         """
-        self.__out_f.write(f'goto {label}\n')
+        self.__write(f'goto {label}\n')
 
     def write_if(self, label: str):
         """Writes if goto.
         """
-        self.__out_f.write(f'if-goto {label}\n')
+        self.__write(f'if-goto {label}\n')
 
     def write_call(self, name: str, n_args: int):
         """Writes function call.
         """
-        self.__out_f.write(f'call {name} {n_args}\n')
+        self.__write(f'call {name} {n_args}\n')
 
     def write_function(self, name: str, n_locals: int):
         """Writes function declaration.
         """
-        self.__out_f.write(f'function {name} {n_locals}\n')
+        self.__write(f'function {name} {n_locals}\n')
 
     def write_return(self):
         """Writes return.
         """
-        self.__out_f.write(f'return\n')
+        self.__write('return\n')
+
+    def flush(self):
+        """Writes buffered lines to the output file, if any.
+        """
+        if self.__out_f is not None and self.lines:
+            self.__out_f.writelines(self.lines)
+            self.lines.clear()
+
+    def getvalue(self) -> str:
+        """Returns buffered code.
+        """
+        return ''.join(self.lines)
@@ -0,0 +1,39 @@
+import os
+import argparse
+import time
+from cpu import CPU
+from jit import BlockCPU
+from rom import load_rom
+
+
+def timed_run(cpu: CPU, cycles: int) -> float:
+    start = time.perf_counter()
+    cpu.run(cycles)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark per-instruction and basic-block execution.')
+    parser.add_argument('input', nargs='+', help='Paths of ROM images.')
+    parser.add_argument('-n', '--cycles', type=int, default=5000000,
+                        help='Number of instructions to execute.')
+
+    args = parser.parse_args()
+
+    print(f'{"program":<24}{"interp MIPS":>12}{"block MIPS":>12}{"speedup":>9}')
+    for fname in args.input:
+        rom = load_rom(fname)
+        cpu = CPU(rom)
+        block_cpu = BlockCPU(rom)
+        t_cpu = timed_run(cpu, args.cycles)
+        t_block = timed_run(block_cpu, args.cycles)
+
+        # Both backends must end in the same machine state
+        assert (cpu.pc, cpu.a, cpu.d, cpu.cycles) == \
+            (block_cpu.pc, block_cpu.a, block_cpu.d, block_cpu.cycles)
+        assert cpu.ram == block_cpu.ram
+
+        name = os.path.splitext(os.path.basename(fname))[0]
+        print(f'{name:<24}{cpu.cycles / t_cpu / 1e6:12.2f}'
+              f'{block_cpu.cycles / t_block / 1e6:12.2f}{t_cpu / t_block:8.1f}x')
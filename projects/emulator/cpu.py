@@ -0,0 +1,154 @@
+from array import array
+from typing import Callable, List, Tuple
+
+RAM_SIZE = 0x8000
+SCREEN = 0x4000
+KBD = 0x6000
+
+
+# Simplified expressions for the ALU functions of the Hack instruction set.
+# Results only leave the signed 16-bit range on overflow, so the range is
+# checked before wrapping.
+bits2expr = {
+    0b101010: '0',
+    0b111111: '1',
+    0b111010: '-1',
+    0b001100: '{x}',
+    0b110000: '{y}',
+    0b001101: '~{x}',
+    0b110001: '~{y}',
+    0b001111: '(-{x} if {x} != -32768 else {x})',
+    0b110011: '(-{y} if {y} != -32768 else {y})',
+    0b011111: '({x} + 1 if {x} != 32767 else -32768)',
+    0b110111: '({y} + 1 if {y} != 32767 else -32768)',
+    0b001110: '({x} - 1 if {x} != -32768 else 32767)',
+    0b110010: '({y} - 1 if {y} != -32768 else 32767)',
+    0b000010: '(w if -32768 <= (w := {x} + {y}) <= 32767 else w - 0x10000 if w > 0 else w + 0x10000)',
+    0b010011: '(w if -32768 <= (w := {x} - {y}) <= 32767 else w - 0x10000 if w > 0 else w + 0x10000)',
+    0b000111: '(w if -32768 <= (w := {y} - {x}) <= 32767 else w - 0x10000 if w > 0 else w + 0x10000)',
+    0b000000: '{x} & {y}',
+    0b010101: '{x} | {y}',
+}
+
+
+def alu_expr(bits: int, x: str = 'd', y: str = 'y') -> str:
+    """Returns Python expression computing the ALU output for 6 control bits
+    (zx, nx, zy, ny, f, no) on signed 16-bit operands `x` and `y`.
+    """
+    if bits in bits2expr:
+        return bits2expr[bits].format(x=x, y=y)
+
+    zx, nx, zy, ny, f, no = [(bits >> i) & 1 for i in range(5, -1, -1)]
+
+    if zx:
+        x = '0'
+    if nx:
+        x = f'~{x}'
+    if zy:
+        y = '0'
+    if ny:
+        y = f'~{y}'
+
+    if f:
+        # Integer addition, wrapped to signed 16-bit
+        out = f'((({x} + {y}) + 0x8000) & 0xFFFF) - 0x8000'
+    else:
+        out = f'{x} & {y}'
+
+    if no:
+        out = f'~({out})'
+    return out
+
+
+def comp_expr(comp: int) -> str:
+    """Returns Python expression for 7-bit comp field in terms of `a`, `d` and `m`.
+    """
+    return alu_expr(comp & 0x3F, 'd', 'm' if comp & 0x40 else 'a')
+
+
+# Comp field to function of (a, d, m)
+comp2fn: List[Callable[[int, int, int], int]] = [
+    eval(f'lambda a, d, m: {comp_expr(comp)}') for comp in range(128)
+]
+
+
+def decode(word: int) -> Tuple:
+    """Decodes machine word to (value, comp function, dest bits, jump table).
+
+    The jump table is indexed by the sign of the ALU output plus one and is
+    None if the instruction never jumps. A-instructions have no comp function.
+    """
+    if not word & 0x8000:
+        return (word, None, 0, None)
+
+    comp = (word >> 6) & 0x7F
+    dest = (word >> 3) & 0x7
+    jump = word & 0x7
+    if jump:
+        jump_table = (bool(jump & 4), bool(jump & 2), bool(jump & 1))
+    else:
+        jump_table = None
+    return (0, comp2fn[comp], dest, jump_table)
+
+
+class CPU:
+    """Hack CPU executing a decoded ROM image.
+    """
+
+    def __init__(self, rom: array):
+        self.rom = rom
+        self.ram = array('h', bytes(2*RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.__decoded = [decode(w) for w in rom]
+
+    def reset(self):
+        """Restarts program from address 0.
+        """
+        self.pc = 0
+
+    @property
+    def halted(self) -> bool:
+        """Whether the PC has run past the end of the program.
+        """
+        return not 0 <= self.pc < len(self.__decoded)
+
+    def run(self, cycles: int) -> int:
+        """Executes up to `cycles` instructions. Returns number of instructions executed.
+        """
+        decoded = self.__decoded
+        n_rom = len(decoded)
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+
+        n = 0
+        while n < cycles and 0 <= pc < n_rom:
+            value, comp, dest, jump = decoded[pc]
+            n += 1
+
+            if comp is None:
+                # A-instruction
+                a = value
+                pc += 1
+                continue
+
+            out = comp(a, d, ram[a])
+            target = a
+            if dest:
+                if dest & 1:
+                    ram[a] = out
+                if dest & 2:
+                    d = out
+                if dest & 4:
+                    a = out
+
+            if jump is not None and jump[(out > 0) - (out < 0) + 1]:
+                pc = target & 0x7FFF
+            else:
+                pc += 1
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += n
+        return n
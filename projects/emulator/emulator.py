@@ -0,0 +1,44 @@
+import argparse
+from cpu import CPU
+from jit import BlockCPU
+from rom import load_rom
+
+
+def parse_range(s: str) -> range:
+    """Parses `START:END` (end exclusive) or single address.
+    """
+    if ':' in s:
+        start, end = s.split(':')
+        return range(int(start, 0), int(end, 0))
+    addr = int(s, 0)
+    return range(addr, addr+1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run HACK machine code.')
+    parser.add_argument('input', help='Path of the .hack, .hex or .bin file.')
+    parser.add_argument('-n', '--cycles', type=int, default=1000000,
+                        help='Maximum number of instructions to execute.')
+    parser.add_argument('--set', action='append', default=[], metavar='ADDR=VALUE',
+                        help='Set RAM word before running.')
+    parser.add_argument('--dump', action='append', default=[], metavar='START:END',
+                        help='Print RAM range after running.')
+    parser.add_argument('--jit', action='store_true',
+                        help='Compile basic blocks into Python functions.')
+    parser.add_argument('--endian', choices=['little', 'big'], default='little',
+                        help='Byte order of raw .bin files.')
+
+    args = parser.parse_args()
+
+    cpu_cls = BlockCPU if args.jit else CPU
+    cpu = cpu_cls(load_rom(args.input, args.endian))
+    for assignment in args.set:
+        addr, value = assignment.split('=')
+        cpu.ram[int(addr, 0)] = int(value, 0)
+
+    cpu.run(args.cycles)
+    print(f'cycles: {cpu.cycles} pc: {cpu.pc} A: {cpu.a} D: {cpu.d}')
+
+    for r in args.dump:
+        for addr in parse_range(r):
+            print(f'RAM[{addr}] = {cpu.ram[addr]}')
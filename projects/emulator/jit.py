@@ -0,0 +1,160 @@
+from array import array
+from typing import Callable, List, Tuple
+from cpu import CPU, alu_expr
+
+# Jump field to condition on ALU output `t`
+jump2cond = {
+    1: '{t} > 0',
+    2: '{t} == 0',
+    3: '{t} >= 0',
+    4: '{t} < 0',
+    5: '{t} != 0',
+    6: '{t} <= 0',
+}
+
+
+# Instructions a block follows unconditional jumps for
+MAX_BLOCK = 256
+
+# Times an address is reached before a block is compiled there. Code that
+# only runs during startup is cheaper to interpret than to compile.
+HOT_COUNT = 2
+
+
+def compile_block(rom: array, start: int) -> Tuple[Callable, int, bool]:
+    """Compiles block of ROM starting at jump target `start` into a Python function.
+    Returns function of (a, d, ram) returning (pc, a, d, instructions executed),
+    the maximum number of instructions in the block and whether the block is an
+    idle loop that jumps to itself without changing any state.
+
+    The block runs through labels and not-taken conditional jumps, which leave
+    the function early. Unconditional jumps to constant addresses are followed,
+    chaining the blocks they join, until an address is reached again, the block
+    holds `MAX_BLOCK` instructions, or the jump target is computed.
+    Constants loaded into A are substituted where A is read and only stored in
+    the A register when the block exits.
+    """
+    lines = []
+    pc = start
+    # Instructions executed when reaching `pc`
+    count = 0
+    visited = {start}
+    # Value of A when known at compile time
+    known_a = None
+    while pc < len(rom):
+        word = rom[pc]
+        pc += 1
+        count += 1
+
+        if not word & 0x8000:
+            # A-instruction
+            known_a = word
+            continue
+
+        a = 'a' if known_a is None else str(known_a)
+        comp = (word >> 6) & 0x7F
+        dest = (word >> 3) & 0x7
+        jump = word & 0x7
+        expr = alu_expr(comp & 0x3F, 'd', f'ram[{a}]' if comp & 0x40 else a)
+        target = 'a & 0x7FFF' if known_a is None else str(known_a)
+
+        if jump and dest & 4 and known_a is None:
+            # Jump target is the value of A before this instruction
+            lines.append('j = a & 0x7FFF')
+            target = 'j'
+
+        # Variable the jump condition tests
+        cond = 'd' if dest == 2 else 'a' if dest == 4 else 't'
+        if jump and jump != 7 and cond == 't' or bin(dest).count('1') > 1:
+            lines.append(f't = {expr}')
+            expr = 't'
+        if dest & 1:
+            lines.append(f'ram[{a}] = {expr}')
+        if dest & 2:
+            lines.append(f'd = {expr}')
+        if dest & 4:
+            lines.append(f'a = {expr}')
+            known_a = None
+        a = 'a' if known_a is None else str(known_a)
+
+        if jump == 7:
+            if target.isdigit() and int(target) not in visited and count < MAX_BLOCK:
+                # Chain the block at the constant target
+                pc = int(target)
+                visited.add(pc)
+                continue
+            lines.append(f'return {target}, {a}, d, {count}')
+            break
+        elif jump:
+            # Side exit, the block continues if the jump is not taken
+            lines.append(f'if {jump2cond[jump].format(t=cond)}:')
+            lines.append(f'    return {target}, {a}, d, {count}')
+        if count >= MAX_BLOCK:
+            lines.append(f'return {pc}, {a}, d, {count}')
+            break
+        visited.add(pc)
+    else:
+        a = 'a' if known_a is None else str(known_a)
+        lines.append(f'return {pc}, {a}, d, {count}')
+
+    idle = len(lines) == 1 and lines[0].startswith(f'return {start},')
+
+    src = f'def block_{start}(a, d, ram):\n' + \
+        ''.join(f'    {l}\n' for l in lines)
+    namespace = {}
+    exec(compile(src, f'<block {start}>', 'exec'), namespace)
+    return namespace[f'block_{start}'], count, idle
+
+
+class BlockCPU(CPU):
+    """Hack CPU that compiles the ROM into Python functions, one per jump
+    target reached `HOT_COUNT` times, and executes a whole block per dispatch.
+    Other instructions are interpreted.
+    """
+
+    def __init__(self, rom: array):
+        super().__init__(rom)
+        self.__blocks: List[Tuple[Callable, int, bool]] = [None]*len(rom)
+        self.__counts = bytearray(len(rom))
+
+    def run(self, cycles: int) -> int:
+        """Executes up to `cycles` instructions. Returns number of instructions executed.
+        """
+        blocks = self.__blocks
+        counts = self.__counts
+        n_rom = len(blocks)
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+
+        n = 0
+        # Instructions run by the interpreter, which counts them itself
+        interpreted = 0
+        while 0 <= pc < n_rom:
+            block = blocks[pc]
+            if block is None:
+                counts[pc] += 1
+                if counts[pc] < HOT_COUNT:
+                    if n == cycles:
+                        break
+                    self.a, self.d, self.pc = a, d, pc
+                    super().run(1)
+                    a, d, pc = self.a, self.d, self.pc
+                    n += 1
+                    interpreted += 1
+                    continue
+                block = blocks[pc] = compile_block(self.rom, pc)
+            fn, length, idle = block
+            if n + length > cycles:
+                break
+            if idle:
+                # Nothing changes until the cycle budget runs out
+                n += (cycles - n) // length * length - length
+            pc, a, d, k = fn(a, d, ram)
+            n += k
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += n - interpreted
+        if n < cycles:
+            # Finish partial block one instruction at a time
+            n += super().run(cycles - n)
+        return n
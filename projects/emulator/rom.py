@@ -0,0 +1,25 @@
+import os
+import sys
+from array import array
+
+ROM_SIZE = 0x8000
+
+
+def load_rom(fname: str, byteorder: str = 'little') -> array:
+    """Loads ROM image from `.hack` text, `.hex` words or raw `.bin` file.
+    """
+    ext = os.path.splitext(fname)[1]
+    if ext == '.bin':
+        words = array('H')
+        with open(fname, 'rb') as f:
+            words.frombytes(f.read())
+        if byteorder != sys.byteorder:
+            words.byteswap()
+    else:
+        base = 16 if ext == '.hex' else 2
+        with open(fname, 'r') as f:
+            words = array('H', [int(l, base) for l in f.read().split()])
+
+    if len(words) > ROM_SIZE:
+        raise ValueError(f'Program has {len(words)} words but ROM holds {ROM_SIZE}.')
+    return words
@@ -0,0 +1,96 @@
+import os
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+from models import functions
+from netlist import ChipLibrary, default_search_path, flatten
+from parse import HDLException
+from simulator import ParallelSimulator, Simulator, compile_chip, generate
+
+
+def reference(netlist, evaluate: Callable) -> Callable[[Dict[str, int]], Dict[str, int]]:
+    """Returns function computing the output pins of the chip from its input
+    pins, by its behavioral model if it has one, otherwise by the serial
+    simulator.
+    """
+    if netlist.name in functions:
+        inputs, outputs, function = functions[netlist.name]
+        return lambda values: dict(zip(outputs, function(*[values[pin] for pin in inputs])))
+
+    sim = Simulator(netlist, evaluate)
+
+    def simulate(values: Dict[str, int]) -> Dict[str, int]:
+        for pin, value in values.items():
+            sim.set(pin, value)
+        sim.eval()
+        return {pin: sim.get(pin) for pin in netlist.outputs}
+    return simulate
+
+
+def format_pins(values: Dict[str, int]) -> str:
+    return ' '.join(f'{pin}={value}' for pin, value in values.items())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate HDL chips.')
+    parser.add_argument('input', help='Path of the HDL file.')
+    parser.add_argument('--set', action='append', default=[], metavar='PIN=VALUE',
+                        help='Set input pin before evaluating.')
+    parser.add_argument('--source', action='store_true',
+                        help='Print the Python code generated for the chip.')
+    parser.add_argument('--random', type=int, default=0, metavar='N',
+                        help='Time evaluating N random input vectors.')
+    parser.add_argument('--lanes', type=int, default=64,
+                        help='Number of vectors evaluated at once with --random.')
+
+    args = parser.parse_args()
+
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    try:
+        netlist = flatten(ChipLibrary(default_search_path(args.input)), name)
+        evaluate = compile_chip(netlist)
+    except HDLException as e:
+        print(f'error: {e}')
+        exit(1)
+
+    if args.source:
+        print(generate(netlist))
+    print(f'{name}: {len(netlist.nand_out)} Nand, {len(netlist.dff_out)} DFF, '
+          f'{len(netlist.memories)} memories')
+
+    if args.random:
+        sim = ParallelSimulator(netlist, args.lanes, evaluate)
+        check = reference(netlist, evaluate)
+        widths = {pin: len(nets) for pin, nets in netlist.inputs.items()}
+        elapsed = 0.0
+        for _ in range(0, args.random, args.lanes):
+            inputs = {pin: [random.getrandbits(width) for _ in range(args.lanes)]
+                      for pin, width in widths.items()}
+            start = time.perf_counter()
+            for pin, values in inputs.items():
+                sim.set(pin, values)
+            sim.eval()
+            outputs: Dict[str, List[int]] = {pin: sim.get(pin) for pin in netlist.outputs}
+            elapsed += time.perf_counter() - start
+
+            for lane in range(args.lanes):
+                vector = {pin: values[lane] for pin, values in inputs.items()}
+                got = {pin: values[lane] for pin, values in outputs.items()}
+                expected = check(vector)
+                if got != expected:
+                    print(f'mismatch: {format_pins(vector)}')
+                    print(f'  expected {format_pins(expected)}')
+                    print(f'  got      {format_pins(got)}')
+                    exit(1)
+        against = 'model' if name in functions else 'serial simulator'
+        print(f'{args.random} vectors in {elapsed:.3f} s, {args.lanes} at once, '
+              f'all match the {against}')
+        exit(0)
+
+    sim = Simulator(netlist, evaluate)
+    for assignment in args.set:
+        pin, value = assignment.split('=')
+        sim.set(pin, int(value, 0))
+    sim.eval()
+    for pin in netlist.outputs:
+        print(f'{pin} = {sim.get(pin)}')
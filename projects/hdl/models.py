@@ -0,0 +1,58 @@
+from typing import Callable, Dict, List, Tuple
+
+# Words of chips simulated as memories. A Register is a memory of one word.
+ram_sizes = {
+    'Register': 1,
+    'RAM8': 8,
+    'RAM64': 64,
+    'RAM512': 512,
+    'RAM4K': 0x1000,
+    'RAM16K': 0x4000,
+}
+
+
+def alu(x: int, y: int, zx: int, nx: int, zy: int, ny: int, f: int, no: int) -> Tuple[int, ...]:
+    if zx:
+        x = 0
+    if nx:
+        x ^= 0xFFFF
+    if zy:
+        y = 0
+    if ny:
+        y ^= 0xFFFF
+    out = (x + y) & 0xFFFF if f else x & y
+    if no:
+        out ^= 0xFFFF
+    return out, int(out == 0), out >> 15
+
+
+def add16(a: int, b: int) -> Tuple[int, ...]:
+    return (a + b) & 0xFFFF,
+
+
+def inc16(x: int) -> Tuple[int, ...]:
+    return (x + 1) & 0xFFFF,
+
+
+def pc_next(x: int, load: int, inc: int, reset: int, out: int) -> Tuple[int, ...]:
+    """Returns value the PC takes on the next clock cycle.
+    """
+    if reset:
+        return 0,
+    if load:
+        return x,
+    if inc:
+        return (out + 1) & 0xFFFF,
+    return out,
+
+
+# Combinational chips as (input pins, output pins, function of the unsigned
+# input values returning the output values)
+functions: Dict[str, Tuple[List[str], List[str], Callable]] = {
+    'ALU': (['x', 'y', 'zx', 'nx', 'zy', 'ny', 'f', 'no'], ['out', 'zr', 'ng'], alu),
+    'Add16': (['a', 'b'], ['out'], add16),
+    'Inc16': (['in'], ['out'], inc16),
+}
+
+# Chips with behavioral models. The PC is a register holding `pc_next`.
+model_chips = sorted([*ram_sizes, *functions, 'PC'])
@@ -0,0 +1,345 @@
+import os
+from array import array
+from typing import Callable, Collection, Dict, List, Optional
+from models import functions, pc_next, ram_sizes
+from parse import ChipDef, HDLException, parse_hdl
+
+projects_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Projects with chips that later projects are built from
+chip_dirs = ['01', '02', os.path.join('03', 'a'), os.path.join('03', 'b'), '05']
+
+# Nets with constant values
+FALSE = 0
+TRUE = 1
+
+# Interfaces of chips simulated without HDL
+builtin_chips = {
+    'Nand': ChipDef('Nand', [('a', 1), ('b', 1)], [('out', 1)], []),
+    'DFF': ChipDef('DFF', [('in', 1)], [('out', 1)], []),
+    'ROM32K': ChipDef('ROM32K', [('address', 15)], [('out', 16)], []),
+    'Screen': ChipDef('Screen', [('in', 16), ('load', 1), ('address', 13)], [('out', 16)], []),
+    'Keyboard': ChipDef('Keyboard', [], [('out', 16)], []),
+}
+
+# Number of words of builtin memory chips
+memory_sizes = {
+    'ROM32K': 0x8000,
+    'Screen': 0x2000,
+    'Keyboard': 1,
+}
+
+# Builtin chips that only differ from an HDL chip by how the GUI shows them
+chip_aliases = {
+    'ARegister': 'Register',
+    'DRegister': 'Register',
+}
+
+
+def default_search_path(hdl_path: str) -> List[str]:
+    """Returns directories to look up parts of a chip in: its own directory,
+    then the projects with the chips of the computer.
+    """
+    path = [os.path.dirname(os.path.abspath(hdl_path))]
+    for chip_dir in chip_dirs:
+        chip_dir = os.path.abspath(os.path.join(projects_dir, chip_dir))
+        if chip_dir not in path:
+            path.append(chip_dir)
+    return path
+
+
+class ChipLibrary:
+    """Finds and parses chip definitions by name.
+    """
+
+    def __init__(self, search_path: List[str]):
+        self.search_path = search_path
+        self.__chips = dict(builtin_chips)
+
+    def find(self, name: str) -> Optional[str]:
+        """Returns path of the HDL file of chip `name`, None if there is none.
+        """
+        for path in self.search_path:
+            fname = os.path.join(path, f'{name}.hdl')
+            if os.path.exists(fname):
+                return fname
+        return None
+
+    def load(self, name: str) -> ChipDef:
+        """Returns definition of chip `name` from the first directory of the
+        search path holding its HDL file, or builtin chip.
+        """
+        if name in self.__chips:
+            return self.__chips[name]
+        fname = self.find(name)
+        if fname is not None:
+            try:
+                chip = parse_hdl(fname)
+            except HDLException as e:
+                raise HDLException(f'{fname}: {e}')
+        else:
+            if name not in chip_aliases:
+                raise HDLException(f'No HDL found for chip `{name}`.')
+            chip = self.load(chip_aliases[name])
+        self.__chips[name] = chip
+        return chip
+
+
+class Memory:
+    """Builtin memory chip, or RAM simulated by a model. Reads are
+    combinational, writes are clocked.
+    """
+
+    def __init__(self, kind: str, address: List[int], data: List[int],
+                 load: Optional[int], out: List[int], size: Optional[int] = None):
+        self.kind = kind
+        self.size = memory_sizes[kind] if size is None else size
+        self.address = address
+        self.data = data
+        self.load = load
+        self.out = out
+
+
+class Function:
+    """Combinational chip simulated by a Python function of the unsigned
+    values of its input pins, returning those of its output pins.
+    """
+
+    def __init__(self, kind: str, function: Callable, inputs: List[List[int]],
+                 outputs: List[List[int]]):
+        self.kind = kind
+        self.function = function
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+class Instance:
+    """Part of a chip, with the ranges of DFFs and memories it holds, so a
+    test can read its state.
+    """
+
+    def __init__(self, dffs: range, memories: range):
+        self.dffs = dffs
+        self.memories = memories
+
+
+class Netlist:
+    """Chip flattened to Nand gates, DFFs and builtin memories connected by
+    numbered nets. Bits of pins and buses are lists of nets, least
+    significant bit first. Nets 0 and 1 are the constants false and true.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # Union-find forest of nets, connected nets share a root
+        self.__parent = array('I', [FALSE, TRUE])
+        self.nand_a = array('I')
+        self.nand_b = array('I')
+        self.nand_out = array('I')
+        self.dff_in = array('I')
+        self.dff_out = array('I')
+        self.memories: List[Memory] = []
+        self.functions: List[Function] = []
+        self.inputs: Dict[str, List[int]] = {}
+        self.outputs: Dict[str, List[int]] = {}
+        # First part of each name anywhere in the hierarchy
+        self.parts: Dict[str, Instance] = {}
+
+    @property
+    def n_nets(self) -> int:
+        return len(self.__parent)
+
+    def new_net(self) -> int:
+        net = len(self.__parent)
+        self.__parent.append(net)
+        return net
+
+    def find(self, net: int) -> int:
+        """Returns root of net, shortening the path to it.
+        """
+        parent = self.__parent
+        root = net
+        while parent[root] != root:
+            root = parent[root]
+        while parent[net] != root:
+            parent[net], net = root, parent[net]
+        return root
+
+    def union(self, a: int, b: int):
+        """Connects two nets. Constants stay roots.
+        """
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return
+        if a <= TRUE and b <= TRUE:
+            raise HDLException('Constants `true` and `false` are connected.')
+        if b < a:
+            a, b = b, a
+        self.__parent[b] = a
+
+    def canonicalize(self):
+        """Replaces all nets with their roots.
+        """
+        for nets in [self.nand_a, self.nand_b, self.nand_out, self.dff_in, self.dff_out]:
+            for i, net in enumerate(nets):
+                nets[i] = self.find(net)
+        for memory in self.memories:
+            memory.address = [self.find(net) for net in memory.address]
+            memory.data = [self.find(net) for net in memory.data]
+            if memory.load is not None:
+                memory.load = self.find(memory.load)
+            memory.out = [self.find(net) for net in memory.out]
+        for function in self.functions:
+            function.inputs = [[self.find(net) for net in nets] for nets in function.inputs]
+            function.outputs = [[self.find(net) for net in nets] for nets in function.outputs]
+        for pins in [self.inputs, self.outputs]:
+            for name, nets in pins.items():
+                pins[name] = [self.find(net) for net in nets]
+
+
+def pin_bits(pin_range, width: int, chip: str, pin: str) -> range:
+    """Returns bit indices of a pin range, checking them against the width.
+    """
+    if pin_range is None:
+        return range(width)
+    lo, hi = pin_range
+    if not 0 <= lo <= hi < width:
+        raise HDLException(f'Bits {lo}..{hi} out of range of `{chip}.{pin}[{width}]`.')
+    return range(lo, hi + 1)
+
+
+class Flattener:
+    """Flattens chip hierarchy into a netlist. Parts named in `models` are
+    simulated by their behavioral models instead of their HDL.
+    """
+
+    def __init__(self, library: ChipLibrary, models: Collection[str] = ()):
+        self.library = library
+        self.models = models
+
+    def flatten(self, name: str) -> Netlist:
+        """Returns netlist of chip `name` with fresh nets for its pins.
+        """
+        chip = self.library.load(name)
+        netlist = Netlist(chip.name)
+        for pin, width in chip.inputs.items():
+            netlist.inputs[pin] = [netlist.new_net() for _ in range(width)]
+        for pin, width in chip.outputs.items():
+            netlist.outputs[pin] = [netlist.new_net() for _ in range(width)]
+        self.__netlist = netlist
+        self.instantiate(chip, {**netlist.inputs, **netlist.outputs})
+        netlist.canonicalize()
+        return netlist
+
+    def instantiate(self, chip: ChipDef, pins: Dict[str, List[int]]):
+        """Adds chip to the netlist with its pins connected to the given nets.
+        """
+        netlist = self.__netlist
+        if chip.name == 'Nand':
+            netlist.nand_a.append(pins['a'][0])
+            netlist.nand_b.append(pins['b'][0])
+            netlist.nand_out.append(pins['out'][0])
+            return
+        if chip.name == 'DFF':
+            netlist.dff_in.append(pins['in'][0])
+            netlist.dff_out.append(pins['out'][0])
+            return
+        if chip.name in memory_sizes:
+            netlist.memories.append(Memory(
+                chip.name, pins.get('address', []), pins.get('in', []),
+                pins['load'][0] if 'load' in pins else None, pins['out']))
+            return
+
+        # Bits of internal wires, created when first used
+        wires: Dict[str, Dict[int, int]] = {}
+
+        def bus_net(bus: str, bit: int, driving: bool) -> int:
+            if bus in chip.inputs:
+                if driving:
+                    raise HDLException(f'Part output connected to input `{bus}` of `{chip.name}`.')
+                return pins[bus][pin_bits((bit, bit), chip.inputs[bus], chip.name, bus)[0]]
+            if bus in chip.outputs:
+                if not driving:
+                    raise HDLException(f'Output `{bus}` of `{chip.name}` used as part input.')
+                return pins[bus][pin_bits((bit, bit), chip.outputs[bus], chip.name, bus)[0]]
+            bits = wires.setdefault(bus, {})
+            if bit not in bits:
+                bits[bit] = netlist.new_net()
+            return bits[bit]
+
+        for part in chip.parts:
+            part_def = self.library.load(part.name)
+            part_pins = {pin: [FALSE] * width for pin, width in part_def.inputs.items()}
+            for pin, width in part_def.outputs.items():
+                part_pins[pin] = [netlist.new_net() for _ in range(width)]
+
+            for conn in part.connections:
+                driving = conn.pin in part_def.outputs
+                if driving:
+                    width = part_def.outputs[conn.pin]
+                elif conn.pin in part_def.inputs:
+                    width = part_def.inputs[conn.pin]
+                else:
+                    raise HDLException(f'Chip `{part.name}` has no pin `{conn.pin}`.')
+                bits = pin_bits(conn.pin_range, width, part.name, conn.pin)
+                if conn.bus in ['true', 'false']:
+                    if driving:
+                        raise HDLException(
+                            f'Output of `{part.name}` connected to `{conn.bus}` in `{chip.name}`.')
+                    for bit in bits:
+                        part_pins[conn.pin][bit] = TRUE if conn.bus == 'true' else FALSE
+                    continue
+
+                if conn.bus_range is None:
+                    bus_bits = range(len(bits))
+                else:
+                    bus_bits = range(conn.bus_range[0], conn.bus_range[1] + 1)
+                    if len(bus_bits) != len(bits):
+                        raise HDLException(
+                            f'Width mismatch in `{part.name}({conn})` of `{chip.name}`.')
+                for bit, bus_bit in zip(bits, bus_bits):
+                    net = bus_net(conn.bus, bus_bit, driving)
+                    if driving:
+                        netlist.union(part_pins[conn.pin][bit], net)
+                    else:
+                        part_pins[conn.pin][bit] = net
+
+            dff_start = len(netlist.dff_out)
+            memory_start = len(netlist.memories)
+            if part_def.name in self.models:
+                self.instantiate_model(part_def, part_pins)
+            else:
+                self.instantiate(part_def, part_pins)
+            if part.name not in netlist.parts:
+                netlist.parts[part.name] = Instance(
+                    range(dff_start, len(netlist.dff_out)),
+                    range(memory_start, len(netlist.memories)))
+
+    def instantiate_model(self, chip: ChipDef, pins: Dict[str, List[int]]):
+        """Adds behavioral model of chip to the netlist.
+        """
+        netlist = self.__netlist
+        if chip.name in ram_sizes:
+            netlist.memories.append(Memory(
+                chip.name, pins.get('address', []), pins['in'], pins['load'][0], pins['out'],
+                ram_sizes[chip.name]))
+        elif chip.name in functions:
+            inputs, outputs, function = functions[chip.name]
+            netlist.functions.append(Function(
+                chip.name, function, [pins[pin] for pin in inputs], [pins[pin] for pin in outputs]))
+        elif chip.name == 'PC':
+            next_out = [netlist.new_net() for _ in pins['out']]
+            netlist.functions.append(Function(
+                chip.name, pc_next,
+                [pins['in'], pins['load'], pins['inc'], pins['reset'], pins['out']], [next_out]))
+            netlist.memories.append(Memory(chip.name, [], next_out, TRUE, pins['out'], 1))
+        else:
+            raise HDLException(f'No model of chip `{chip.name}`.')
+
+
+def flatten(library: ChipLibrary, name: str, models: Collection[str] = ()) -> Netlist:
+    """Flattens chip `name` down to Nand gates, DFFs, builtin memories and
+    models of the parts named in `models`.
+    """
+    return Flattener(library, models).flatten(name)
@@ -0,0 +1,173 @@
+import re
+from typing import List, Optional, Tuple
+
+token_re = re.compile(r'''
+    (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<int>\d+)
+    |(?P<symbol>\.\.|[{}()\[\];,=:])
+''', re.VERBOSE | re.DOTALL)
+
+# Bit range of a pin or bus, both ends included
+Range = Optional[Tuple[int, int]]
+
+
+class HDLException(Exception):
+    pass
+
+
+class Connection:
+    """Connection `pin[range]=bus[range]` of a part. A missing range covers
+    the whole pin or the same number of bits of the bus.
+    """
+
+    def __init__(self, pin: str, pin_range: Range, bus: str, bus_range: Range):
+        self.pin = pin
+        self.pin_range = pin_range
+        self.bus = bus
+        self.bus_range = bus_range
+
+    def __repr__(self):
+        return f'{self.pin}{self.pin_range or ""}={self.bus}{self.bus_range or ""}'
+
+
+class Part:
+    """Chip used as part of another chip.
+    """
+
+    def __init__(self, name: str, connections: List[Connection]):
+        self.name = name
+        self.connections = connections
+
+    def __repr__(self):
+        return f'{self.name}({", ".join(map(repr, self.connections))})'
+
+
+class ChipDef:
+    """Chip interface with its input and output pin widths and parts.
+    """
+
+    def __init__(self, name: str, inputs: List[Tuple[str, int]],
+                 outputs: List[Tuple[str, int]], parts: List[Part]):
+        self.name = name
+        self.inputs = dict(inputs)
+        self.outputs = dict(outputs)
+        self.parts = parts
+
+
+class Parser:
+    """HDL chip parser.
+    """
+
+    def __init__(self, text: str):
+        self.__tokens = []
+        pos = 0
+        for m in token_re.finditer(text):
+            if m.start() != pos:
+                break
+            pos = m.end()
+            if m.lastgroup != 'skip':
+                self.__tokens.append(m.group())
+        if pos != len(text):
+            raise HDLException(f'Invalid character `{text[pos]}`.')
+        self.__pos = 0
+
+    def parse(self) -> ChipDef:
+        """Parses chip definition.
+        """
+        self.__expect('CHIP')
+        name = self.__expect_name()
+        self.__expect('{')
+        inputs = []
+        outputs = []
+        while self.__peek() in ['IN', 'OUT']:
+            pins = inputs if self.__next() == 'IN' else outputs
+            pins.append(self.__parse_pin_dec())
+            while self.__peek() == ',':
+                self.__next()
+                pins.append(self.__parse_pin_dec())
+            self.__expect(';')
+
+        if self.__peek() in ['BUILTIN', 'CLOCKED']:
+            raise HDLException(f'Builtin chip `{name}` has no parts to simulate.')
+        self.__expect('PARTS')
+        self.__expect(':')
+        parts = []
+        while self.__peek() != '}':
+            parts.append(self.__parse_part())
+        self.__expect('}')
+        return ChipDef(name, inputs, outputs, parts)
+
+    def __parse_pin_dec(self) -> Tuple[str, int]:
+        name = self.__expect_name()
+        width = 1
+        if self.__peek() == '[':
+            self.__next()
+            width = self.__expect_int()
+            self.__expect(']')
+        return name, width
+
+    def __parse_part(self) -> Part:
+        name = self.__expect_name()
+        self.__expect('(')
+        connections = [self.__parse_connection()]
+        while self.__peek() == ',':
+            self.__next()
+            connections.append(self.__parse_connection())
+        self.__expect(')')
+        self.__expect(';')
+        return Part(name, connections)
+
+    def __parse_connection(self) -> Connection:
+        pin = self.__expect_name()
+        pin_range = self.__parse_range()
+        self.__expect('=')
+        bus = self.__expect_name()
+        bus_range = self.__parse_range()
+        return Connection(pin, pin_range, bus, bus_range)
+
+    def __parse_range(self) -> Range:
+        if self.__peek() != '[':
+            return None
+        self.__next()
+        lo = hi = self.__expect_int()
+        if self.__peek() == '..':
+            self.__next()
+            hi = self.__expect_int()
+        self.__expect(']')
+        return lo, hi
+
+    def __peek(self) -> Optional[str]:
+        if self.__pos < len(self.__tokens):
+            return self.__tokens[self.__pos]
+        return None
+
+    def __next(self) -> str:
+        token = self.__peek()
+        if token is None:
+            raise HDLException('Unexpected end of file.')
+        self.__pos += 1
+        return token
+
+    def __expect(self, token: str):
+        if self.__next() != token:
+            raise HDLException(f'Expected `{token}`.')
+
+    def __expect_name(self) -> str:
+        token = self.__next()
+        if not (token[0].isalpha() or token[0] == '_'):
+            raise HDLException(f'Expected a name, got `{token}`.')
+        return token
+
+    def __expect_int(self) -> int:
+        token = self.__next()
+        if not token.isdigit():
+            raise HDLException(f'Expected a number, got `{token}`.')
+        return int(token)
+
+
+def parse_hdl(fname: str) -> ChipDef:
+    """Parses chip definition from HDL file.
+    """
+    with open(fname, 'r') as f:
+        return Parser(f.read()).parse()
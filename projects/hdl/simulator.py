@@ -0,0 +1,488 @@
+import sys
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+from netlist import FALSE, TRUE, Instance, Netlist
+from parse import HDLException
+
+# Node driving a net: ('nand', index), ('memory', index) or ('function', index)
+Driver = Tuple[str, int]
+
+
+def find_drivers(netlist: Netlist) -> Dict[int, Driver]:
+    """Returns the gate or memory driving each net, checking for nets with
+    more than one driver.
+    """
+    drivers = {}
+
+    def drive(net: int, driver: Driver):
+        if net in drivers or net <= TRUE or net in sources:
+            raise HDLException(f'Net {net} of `{netlist.name}` has more than one driver.')
+        drivers[net] = driver
+
+    sources = set(netlist.dff_out)
+    for nets in netlist.inputs.values():
+        sources.update(nets)
+    for i, net in enumerate(netlist.nand_out):
+        drive(net, ('nand', i))
+    for i, memory in enumerate(netlist.memories):
+        for net in memory.out:
+            drive(net, ('memory', i))
+    for i, function in enumerate(netlist.functions):
+        for nets in function.outputs:
+            for net in nets:
+                drive(net, ('function', i))
+    return drivers
+
+
+def node_inputs(netlist: Netlist, driver: Driver) -> List[int]:
+    """Returns nets a gate, memory or function reads combinationally.
+    """
+    kind, i = driver
+    if kind == 'nand':
+        return [netlist.nand_a[i], netlist.nand_b[i]]
+    if kind == 'memory':
+        return netlist.memories[i].address
+    return [net for nets in netlist.functions[i].inputs for net in nets]
+
+
+def sort_nodes(netlist: Netlist, drivers: Dict[int, Driver], roots: List[int]) -> List[Driver]:
+    """Returns gates, memories and functions that the root nets depend on,
+    each after the nodes driving its inputs.
+    """
+    def inputs(driver: Driver) -> List[int]:
+        return node_inputs(netlist, driver)
+
+    order = []
+    # Nodes on the current path are False, finished nodes True
+    done = {}
+    for root in roots:
+        if root not in drivers or drivers[root] in done:
+            continue
+        stack = [(drivers[root], iter(inputs(drivers[root])))]
+        done[drivers[root]] = False
+        while stack:
+            driver, nets = stack[-1]
+            for net in nets:
+                child = drivers.get(net)
+                if child is None:
+                    continue
+                state = done.get(child)
+                if state is None:
+                    done[child] = False
+                    stack.append((child, iter(inputs(child))))
+                    break
+                if state is False:
+                    raise HDLException(f'Combinational loop through net {net} of `{netlist.name}`.')
+            else:
+                stack.pop()
+                done[driver] = True
+                order.append(driver)
+    return order
+
+
+def generate(netlist: Netlist) -> str:
+    """Generates Python source of `evaluate(s, memories, m=1)`, which computes
+    all nets the outputs, DFFs and memory writes depend on from the input and
+    DFF nets in `s`, in topological order. `m` is the value of true: with a
+    mask of n ones, each bit of the nets is evaluated as a separate vector.
+
+    Gates with constant inputs are folded and inverters are merged into the
+    gates reading them, so a Not or an And built from Nand costs no extra
+    statement. Memories and model functions take whole words, so they only
+    work with `m` of 1.
+    """
+    drivers = find_drivers(netlist)
+    exported = set()
+    for nets in netlist.outputs.values():
+        exported.update(nets)
+    exported.update(netlist.dff_in)
+    for memory in netlist.memories:
+        exported.update(memory.address)
+        exported.update(memory.data)
+        if memory.load is not None:
+            exported.add(memory.load)
+    exported = sorted(exported)
+
+    # Expression of each net that has no statement of its own
+    exprs = {FALSE: '0', TRUE: 'm'}
+    # Negated nets, by the net they negate
+    negations = {}
+    loads = []
+    lines = []
+
+    def ref(net: int) -> str:
+        if net not in exprs:
+            exprs[net] = f'n{net}'
+            if net not in drivers:
+                # Input or DFF net, or a wire nothing drives
+                loads.append(f'    n{net} = s[{net}]')
+        return exprs[net]
+
+    def word(nets: List[int]) -> str:
+        # Memories and functions see single values, so `m` is 1 for them
+        return ' | '.join(f'{ref(net)} << {bit}' for bit, net in enumerate(nets)
+                          if ref(net) != '0') or '0'
+
+    def negate(out: int, net: int):
+        expr = ref(net)
+        if expr in ['0', 'm']:
+            exprs[out] = 'm' if expr == '0' else '0'
+        elif net in negations:
+            exprs[out] = exprs[negations[net]]
+        else:
+            exprs[out] = f'(m ^ {expr})'
+            negations[out] = net
+
+    for kind, i in sort_nodes(netlist, drivers, exported):
+        if kind == 'nand':
+            a = netlist.nand_a[i]
+            b = netlist.nand_b[i]
+            out = netlist.nand_out[i]
+            expr_a = ref(a)
+            expr_b = ref(b)
+            if expr_a == '0' or expr_b == '0':
+                exprs[out] = 'm'
+            elif expr_a == 'm':
+                negate(out, b)
+            elif expr_b == 'm' or expr_a == expr_b:
+                negate(out, a)
+            else:
+                exprs[out] = f'n{out}'
+                lines.append(f'    n{out} = m ^ ({expr_a} & {expr_b})')
+        elif kind == 'memory':
+            memory = netlist.memories[i]
+            lines.append(f'    w{i} = memories[{i}][{word(memory.address)}]')
+            for bit, out in enumerate(memory.out):
+                exprs[out] = f'n{out}'
+                lines.append(f'    n{out} = w{i} >> {bit} & 1')
+        else:
+            function = netlist.functions[i]
+            args = ', '.join(word(nets) for nets in function.inputs)
+            lines.append(f'    r{i} = functions[{i}]({args})')
+            for k, nets in enumerate(function.outputs):
+                for bit, out in enumerate(nets):
+                    exprs[out] = f'n{out}'
+                    lines.append(f'    n{out} = r{i}[{k}] >> {bit} & 1')
+
+    # Inputs and DFF nets are already in `s`
+    stores = [f'    s[{net}] = {ref(net)}' for net in exported if net in drivers]
+    return '\n'.join(['def evaluate(s, memories, m=1):'] + loads + lines + stores + ['    pass']) + '\n'
+
+
+def compile_chip(netlist: Netlist) -> Callable:
+    """Returns generated evaluate function of the netlist.
+    """
+    namespace = {'functions': [function.function for function in netlist.functions]}
+    exec(compile(generate(netlist), f'<chip {netlist.name}>', 'exec'), namespace)
+    return namespace['evaluate']
+
+
+class Simulator:
+    """Simulates a flattened chip with a Python function generated for it.
+    Net values, DFF states and memory words are kept in flat arrays.
+    """
+
+    def __init__(self, netlist: Netlist, evaluate: Optional[Callable] = None):
+        self.netlist = netlist
+        self._evaluate = evaluate or compile_chip(netlist)
+        self.values = array('B', bytes(netlist.n_nets))
+        self.values[TRUE] = 1
+        self.memories = [array('H', bytes(2 * memory.size)) for memory in netlist.memories]
+        self._latched = []
+        self._writes = []
+        self.time = 0
+
+    def set(self, pin: str, value: int):
+        """Sets input pin to an integer value, using its low bits.
+        """
+        values = self.values
+        for bit, net in enumerate(self.netlist.inputs[pin]):
+            values[net] = value >> bit & 1
+
+    def get(self, pin: str) -> int:
+        """Returns unsigned value of an input or output pin.
+        """
+        nets = self.netlist.outputs.get(pin) or self.netlist.inputs[pin]
+        values = self.values
+        value = 0
+        for bit, net in enumerate(nets):
+            value |= values[net] << bit
+        return value
+
+    def get_part(self, part: str, index: int = 0) -> int:
+        """Returns unsigned word `index` of a part's memory, or of its DFFs
+        taken 16 at a time in the order the HDL lists them. Like registers of
+        the hardware simulator, DFFs and memories hold the value sampled by a
+        tick before the tock passes it to their outputs.
+        """
+        instance = self.__instance(part)
+        if instance.memories:
+            memory = instance.memories[0]
+            for i, address, word in self._writes:
+                if i == memory and address == index:
+                    return word
+            return self.memories[memory][index]
+        bits = self.__dffs(instance, index)
+        if self._latched:
+            return sum(self._latched[i] << bit for bit, i in enumerate(bits))
+        values = self.values
+        dff_out = self.netlist.dff_out
+        return sum(values[dff_out[i]] << bit for bit, i in enumerate(bits))
+
+    def set_part(self, part: str, index: int, value: int):
+        """Sets word of a part's memory, or of its DFFs like `get_part`.
+        """
+        instance = self.__instance(part)
+        if instance.memories:
+            self.memories[instance.memories[0]][index] = value & 0xFFFF
+            return
+        for bit, i in enumerate(self.__dffs(instance, index)):
+            self.values[self.netlist.dff_out[i]] = value >> bit & 1
+            if self._latched:
+                self._latched[i] = value >> bit & 1
+
+    def __instance(self, part: str) -> Instance:
+        if part not in self.netlist.parts:
+            raise HDLException(f'`{self.netlist.name}` has no part `{part}`.')
+        return self.netlist.parts[part]
+
+    def __dffs(self, instance: Instance, index: int) -> range:
+        dffs = instance.dffs[16 * index:16 * index + 16]
+        if not dffs:
+            raise HDLException(f'Word {index} out of range.')
+        return dffs
+
+    def eval(self):
+        """Computes combinational logic from the inputs and DFF states.
+        """
+        self._evaluate(self.values, self.memories)
+
+    def tick(self):
+        """Rising clock edge: DFFs and memories sample their inputs.
+        """
+        self.eval()
+        values = self.values
+        self._latched = [values[net] for net in self.netlist.dff_in]
+        self._writes = []
+        for i, memory in enumerate(self.netlist.memories):
+            if memory.load is not None and values[memory.load]:
+                address = sum(values[net] << bit for bit, net in enumerate(memory.address))
+                word = sum(values[net] << bit for bit, net in enumerate(memory.data))
+                self._writes.append((i, address, word))
+
+    def tock(self):
+        """Falling clock edge: DFF outputs and memories take the sampled values.
+        """
+        values = self.values
+        for net, value in zip(self.netlist.dff_out, self._latched):
+            values[net] = value
+        for i, address, word in self._writes:
+            self.memories[i][address] = word
+        self._writes = []
+        self.time += 1
+        self.eval()
+
+
+class EventSimulator(Simulator):
+    """Simulates a chip by propagating changes instead of evaluating every
+    gate. Nets changed by pins, DFFs and memory writes schedule the gates,
+    memories and model functions reading them, which are evaluated level by level in topological
+    order, and only gates whose output changes schedule their own readers.
+    Each clock cycle of a sequential chip then costs about the number of gates
+    its state changes reach, and no code is generated.
+    """
+
+    def __init__(self, netlist: Netlist):
+        super().__init__(netlist, self.__propagate)
+        n_nands = len(netlist.nand_out)
+        self.__n_nands = n_nands
+        # Gates are nodes 0 to n_nands - 1, then memories, then functions
+        first_node = {
+            'nand': 0,
+            'memory': n_nands,
+            'function': n_nands + len(netlist.memories),
+        }
+        self.__first_function = first_node['function']
+        self.__gates = list(zip(netlist.nand_a, netlist.nand_b, netlist.nand_out))
+        inputs = [(a, b) for a, b, _ in self.__gates]
+        inputs.extend(memory.address for memory in netlist.memories)
+        inputs.extend(node_inputs(netlist, ('function', i)) for i in range(len(netlist.functions)))
+
+        fanout = [[] for _ in range(netlist.n_nets)]
+        for node, nets in enumerate(inputs):
+            for net in set(nets):
+                fanout[net].append(node)
+        self.__fanout = fanout
+
+        # Level of a node is one more than that of any node driving its inputs
+        drivers = find_drivers(netlist)
+        level = [0] * len(inputs)
+        for kind, i in sort_nodes(netlist, drivers, list(drivers)):
+            node = first_node[kind] + i
+            for net in inputs[node]:
+                if net in drivers:
+                    kind, j = drivers[net]
+                    level[node] = max(level[node], level[first_node[kind] + j] + 1)
+        self.__level = level
+        self.__buckets = [[] for _ in range(max(level, default=0) + 1)]
+        self.__queued = bytearray(len(level))
+
+        # Nets changed since the last evaluation, and nodes to evaluate anyway
+        self.__changed = []
+        self.__stale = list(range(len(level)))
+
+    def set(self, pin: str, value: int):
+        values = self.values
+        for bit, net in enumerate(self.netlist.inputs[pin]):
+            if values[net] != value >> bit & 1:
+                values[net] = value >> bit & 1
+                self.__changed.append(net)
+
+    def set_part(self, part: str, index: int, value: int):
+        super().set_part(part, index, value)
+        instance = self.netlist.parts[part]
+        self.__changed.extend(self.netlist.dff_out[i] for i in instance.dffs)
+        self.__stale.extend(self.__n_nands + i for i in instance.memories)
+
+    def tock(self):
+        values = self.values
+        for net, value in zip(self.netlist.dff_out, self._latched):
+            if values[net] != value:
+                values[net] = value
+                self.__changed.append(net)
+        for i, address, word in self._writes:
+            self.memories[i][address] = word
+            self.__stale.append(self.__n_nands + i)
+        self._writes = []
+        self.time += 1
+        self.eval()
+
+    def __propagate(self, values: array, memories: List[array]):
+        fanout = self.__fanout
+        gates = self.__gates
+        level = self.__level
+        buckets = self.__buckets
+        queued = self.__queued
+        n_nands = self.__n_nands
+
+        lo = len(buckets)
+        hi = -1
+        nodes = self.__stale
+        for net in self.__changed:
+            nodes.extend(fanout[net])
+        for node in nodes:
+            if not queued[node]:
+                queued[node] = 1
+                node_level = level[node]
+                buckets[node_level].append(node)
+                if node_level < lo:
+                    lo = node_level
+                if node_level > hi:
+                    hi = node_level
+        self.__changed = []
+        self.__stale = []
+
+        # Readers of a node are on higher levels, so a bucket is complete
+        # once the levels below it are done
+        current = lo
+        while current <= hi:
+            bucket = buckets[current]
+            for node in bucket:
+                queued[node] = 0
+                if node < n_nands:
+                    a, b, net = gates[node]
+                    value = 1 - (values[a] & values[b])
+                    if values[net] == value:
+                        continue
+                    values[net] = value
+                    readers = fanout[net]
+                else:
+                    readers = self.__update(node)
+                for reader in readers:
+                    if not queued[reader]:
+                        queued[reader] = 1
+                        reader_level = level[reader]
+                        buckets[reader_level].append(reader)
+                        if reader_level > hi:
+                            hi = reader_level
+            bucket.clear()
+            current += 1
+
+    def __update(self, node: int) -> List[int]:
+        """Updates outputs of a memory or function node, returning the nodes
+        reading those that changed.
+        """
+        values = self.values
+        if node < self.__first_function:
+            i = node - self.__n_nands
+            memory = self.netlist.memories[i]
+            address = 0
+            for bit, net in enumerate(memory.address):
+                address |= values[net] << bit
+            words = [self.memories[i][address]]
+            outputs = [memory.out]
+        else:
+            function = self.netlist.functions[node - self.__first_function]
+            args = []
+            for nets in function.inputs:
+                args.append(sum(values[net] << bit for bit, net in enumerate(nets)))
+            words = function.function(*args)
+            outputs = function.outputs
+
+        readers = []
+        for word, nets in zip(words, outputs):
+            for bit, net in enumerate(nets):
+                if values[net] != word >> bit & 1:
+                    values[net] = word >> bit & 1
+                    readers.extend(self.__fanout[net])
+        return readers
+
+
+class ParallelSimulator(Simulator):
+    """Simulates `lanes` independent copies of a chip at once. Bit k of each
+    net value belongs to copy k, so one pass over the gates evaluates all
+    copies. Pins are set and read as lists with one value per copy.
+
+    Builtin memories and models work on whole words and are not supported.
+    """
+
+    def __init__(self, netlist: Netlist, lanes: int = 64, evaluate: Optional[Callable] = None):
+        if netlist.memories or netlist.functions:
+            raise HDLException(
+                f'`{netlist.name}` has memories or models, which cannot be evaluated in parallel.')
+        super().__init__(netlist, evaluate)
+        self.lanes = lanes
+        self.mask = (1 << lanes) - 1
+        self.values = [0] * netlist.n_nets
+        self.values[TRUE] = self.mask
+
+    def set(self, pin: str, values: List[int]):
+        """Sets input pin of each copy to an unsigned value of up to 16 bits.
+        """
+        nets = self.netlist.inputs[pin]
+        words = array('H', values[:self.lanes])
+        words.extend(bytes(self.lanes - len(words)))
+        if sys.byteorder == 'big':
+            words.byteswap()
+        # Binary digits of all copies, last copy and most significant bit first
+        text = format(int.from_bytes(words.tobytes(), 'little'), f'0{16 * self.lanes}b')
+        for bit, net in enumerate(nets):
+            self.values[net] = int(text[15 - bit::16], 2)
+
+    def get(self, pin: str) -> List[int]:
+        """Returns unsigned value of an input or output pin of each copy.
+        """
+        nets = self.netlist.outputs.get(pin) or self.netlist.inputs[pin]
+        # Interleave bits of the nets into 16 binary digits per copy
+        digits = ['0'] * (16 * self.lanes)
+        for bit, net in enumerate(nets):
+            digits[15 - bit::16] = format(self.values[net], f'0{self.lanes}b')
+        words = array('H', int(''.join(digits), 2).to_bytes(2 * self.lanes, 'little'))
+        if sys.byteorder == 'big':
+            words.byteswap()
+        return words.tolist()
+
+    def eval(self):
+        """Computes combinational logic of all copies.
+        """
+        self._evaluate(self.values, self.memories, self.mask)
@@ -0,0 +1,363 @@
+import os
+import re
+import tempfile
+from typing import Collection, Dict, List, Optional, Tuple
+from build import assembler, compile_jack, link, translate_vm
+from script import TestException
+from tools import load_tool, projects_dir
+
+hdl = load_tool('hdl', ['parse', 'models', 'netlist', 'simulator'])
+emulator = load_tool('emulator', ['cpu', 'rom'])
+vm = load_tool('vm', ['machine'])
+
+# Directory of the Jack OS, which stands in for the builtin OS of the VM emulator
+os_dir = os.path.join(projects_dir, '12')
+
+# `Part[index]` or `Part[]` state variable
+state_re = re.compile(r'^(?P<name>[A-Za-z_][A-Za-z0-9_]*)\[(?P<index>\d*)\]$')
+call_re = re.compile(r'^\s*call\s+([^.\s]+)\.', re.MULTILINE)
+function_re = re.compile(r'^\s*function\s+([^.\s]+)\.', re.MULTILINE)
+
+# VM emulator variables for pointers in RAM
+vm_pointers = {
+    'sp': 0,
+    'local': 1,
+    'argument': 2,
+    'this': 3,
+    'that': 4,
+}
+
+
+def signed(value: int) -> int:
+    """Returns 16-bit word as a signed value.
+    """
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def parse_state(name: str):
+    """Splits `Part[index]` into the part name and index, None if `[]`.
+    """
+    m = state_re.match(name)
+    if m is None:
+        raise TestException(f'Unknown variable `{name}`.')
+    index = m.group('index')
+    return m.group('name'), int(index) if index else None
+
+
+def read_words(fname: str) -> List[int]:
+    """Reads `.hack` machine code file.
+    """
+    try:
+        return emulator['rom'].load_rom(fname).tolist()
+    except (OSError, ValueError) as e:
+        raise TestException(f'Cannot load `{fname}`: {e}')
+
+
+class Backend:
+    """Simulator a test script drives. Variables are read as signed values,
+    except pins narrower than 16 bits.
+    """
+
+    # Commands advancing the simulation
+    steps: List[str] = []
+    # Whether programs can read keys, which a script cannot press
+    has_keyboard = False
+
+    @property
+    def time(self) -> str:
+        return '0'
+
+    def get(self, name: str) -> int:
+        raise TestException(f'Unknown variable `{name}`.')
+
+    def set(self, name: str, value: int):
+        raise TestException(f'Unknown variable `{name}`.')
+
+    def step(self, command: str, count: int = 1):
+        raise TestException(f'Unknown command `{command}`.')
+
+    def load_memory(self, part: str, fname: str):
+        raise TestException(f'Cannot load `{fname}` into `{part}`.')
+
+    def snapshot(self) -> Optional[Tuple]:
+        """Returns state that determines all later steps, None if unknown.
+        """
+        return None
+
+
+class HDLBackend(Backend):
+    """Hardware simulator running a chip flattened to gates, event-driven if
+    the chip is sequential. Parts named in `models` are simulated by their
+    behavioral models.
+    """
+
+    steps = ['eval', 'tick', 'tock', 'ticktock']
+
+    def __init__(self, fname: str, models: Collection[str] = ()):
+        name = os.path.splitext(os.path.basename(fname))[0]
+        library = hdl['netlist'].ChipLibrary(hdl['netlist'].default_search_path(fname))
+        try:
+            netlist = hdl['netlist'].flatten(library, name, models)
+            if netlist.dff_out or netlist.memories:
+                # Few nets change per clock cycle, so only propagate changes
+                self.sim = hdl['simulator'].EventSimulator(netlist)
+            else:
+                self.sim = hdl['simulator'].Simulator(netlist)
+        except hdl['parse'].HDLException as e:
+            raise TestException(str(e))
+        self.netlist = netlist
+        self.has_keyboard = any(memory.kind == 'Keyboard' for memory in netlist.memories)
+        self.__ticked = False
+
+    @property
+    def time(self) -> str:
+        return f'{self.sim.time}+' if self.__ticked else f'{self.sim.time}'
+
+    def get(self, name: str) -> int:
+        netlist = self.netlist
+        pins = netlist.outputs if name in netlist.outputs else netlist.inputs
+        if name in pins:
+            value = self.sim.get(name)
+            return signed(value) if len(pins[name]) == 16 else value
+        part, index = parse_state(name)
+        try:
+            return signed(self.sim.get_part(part, index or 0))
+        except (hdl['parse'].HDLException, IndexError) as e:
+            raise TestException(f'Cannot read `{name}`: {e}')
+
+    def set(self, name: str, value: int):
+        if name in self.netlist.inputs:
+            self.sim.set(name, value)
+            return
+        part, index = parse_state(name)
+        try:
+            self.sim.set_part(part, index or 0, value)
+        except (hdl['parse'].HDLException, IndexError) as e:
+            raise TestException(f'Cannot set `{name}`: {e}')
+
+    def step(self, command: str, count: int = 1):
+        sim = self.sim
+        for _ in range(count):
+            if command == 'eval':
+                sim.eval()
+                continue
+            if command != 'tock':
+                sim.tick()
+                self.__ticked = True
+            if command != 'tick':
+                sim.tock()
+                self.__ticked = False
+
+    def load_memory(self, part: str, fname: str):
+        words = read_words(fname)
+        for address, word in enumerate(words):
+            self.set(f'{part}[{address}]', word)
+
+    def snapshot(self) -> Optional[Tuple]:
+        sim = self.sim
+        return (sim.values.tobytes(), [memory.tobytes() for memory in sim.memories],
+                list(sim._latched), list(sim._writes), self.__ticked)
+
+
+class CPUBackend(Backend):
+    """CPU emulator running Hack machine code. VM files are translated with
+    the top of stack cached in D if `cached` is set.
+    """
+
+    steps = ['ticktock']
+    has_keyboard = True
+
+    def __init__(self, fname: str, cached: bool = False):
+        self.cached = cached
+        self.cpu = emulator['cpu'].CPU(self.__load(fname))
+
+    def __load(self, fname: str):
+        """Returns machine code of a `.hack` file, of a `.asm` file, or of
+        the VM files of its directory if there is no such `.asm` file.
+        """
+        if fname.endswith('.hack'):
+            return emulator['rom'].load_rom(fname)
+        path = os.path.dirname(fname)
+        if os.path.exists(fname):
+            with open(fname, 'r') as f:
+                asm_lines = f.read().splitlines()
+        else:
+            vm_fnames = sorted(f for f in os.listdir(path) if f.endswith('.vm'))
+            if not vm_fnames:
+                raise TestException(f'No `{os.path.basename(fname)}` or VM files to translate.')
+            fragments = []
+            for vm_fname in vm_fnames:
+                with open(os.path.join(path, vm_fname), 'r') as f:
+                    fragments.append(translate_vm(vm_fname[:-len('.vm')], f.read(), False,
+                                                  self.cached))
+            asm_lines = link(fragments, False, False, self.cached)
+        try:
+            p = assembler['parse'].Parser(fname)
+            p.parse(asm_lines)
+            return assembler['code'].assemble_words(p.lines, p.sym_table)
+        except KeyError as e:
+            raise TestException(f'{os.path.basename(fname)}: invalid instruction {e.args[0]}')
+        except Exception as e:
+            raise TestException(f'{os.path.basename(fname)}: {e}')
+
+    def get(self, name: str) -> int:
+        cpu = self.cpu
+        if name == 'A':
+            return cpu.a
+        if name == 'D':
+            return cpu.d
+        if name == 'PC':
+            return cpu.pc
+        return cpu.ram[self.__address(name)]
+
+    def set(self, name: str, value: int):
+        cpu = self.cpu
+        if name == 'A':
+            cpu.a = value
+        elif name == 'D':
+            cpu.d = value
+        elif name == 'PC':
+            cpu.pc = value
+        else:
+            cpu.ram[self.__address(name)] = signed(value & 0xFFFF)
+
+    def __address(self, name: str) -> int:
+        part, index = parse_state(name)
+        if part != 'RAM' or index is None:
+            raise TestException(f'Unknown variable `{name}`.')
+        return index
+
+    def step(self, command: str, count: int = 1):
+        if command != 'ticktock':
+            raise TestException(f'Unknown command `{command}`.')
+        self.cpu.run(count)
+
+    def snapshot(self) -> Optional[Tuple]:
+        cpu = self.cpu
+        return cpu.pc, cpu.a, cpu.d, cpu.ram.tobytes()
+
+
+class VMBackend(Backend):
+    """VM emulator running VM code, with Jack sources compiled on load.
+    Classes the program calls but does not define are compiled from the Jack
+    OS, and a program with a `Main` class but no `Sys` gets the OS `Sys`,
+    whose `Sys.init` starts it.
+    """
+
+    steps = ['vmstep']
+    has_keyboard = True
+
+    def __init__(self, fname: str):
+        if os.path.isdir(fname):
+            path = fname
+            names = sorted(f for f in os.listdir(path) if f.endswith(('.vm', '.jack')))
+        else:
+            path = os.path.dirname(fname)
+            names = [os.path.basename(fname)]
+        texts = self.__load(path, names)
+        self.__add_os(texts)
+
+        # The machine reads files, so write the code to a scratch directory
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fnames = []
+            for name, text in texts.items():
+                fnames.append(os.path.join(tmp_dir, f'{name}.vm'))
+                with open(fnames[-1], 'w') as f:
+                    f.write(text)
+            try:
+                self.vm = vm['machine'].VirtualMachine(fnames)
+            except vm['machine'].VMException as e:
+                raise TestException(str(e))
+
+    def __load(self, path: str, names: List[str]) -> Dict[str, str]:
+        """Returns VM code of classes by name, compiling Jack files that have
+        no VM file.
+        """
+        texts = {}
+        for name in names:
+            base, ext = os.path.splitext(name)
+            if ext == '.jack' and base in texts:
+                continue
+            with open(os.path.join(path, name), 'r') as f:
+                text = f.read()
+            if ext == '.jack':
+                if os.path.exists(os.path.join(path, f'{base}.vm')):
+                    continue
+                text = compile_jack_class(name, text)
+            texts[base] = text
+        return texts
+
+    def __add_os(self, texts: Dict[str, str]):
+        if 'Main' in texts and 'Sys' not in texts:
+            wanted = ['Sys']
+        else:
+            wanted = []
+        defined = set(texts)
+        for text in texts.values():
+            defined.update(function_re.findall(text))
+            wanted.extend(call_re.findall(text))
+        while wanted:
+            name = wanted.pop()
+            if name in defined:
+                continue
+            defined.add(name)
+            jack_fname = os.path.join(os_dir, f'{name}.jack')
+            if not os.path.exists(jack_fname):
+                continue
+            with open(jack_fname, 'r') as f:
+                texts[name] = compile_jack_class(jack_fname, f.read())
+            wanted.extend(call_re.findall(texts[name]))
+
+    def get(self, name: str) -> int:
+        return self.vm.ram[self.__address(name)]
+
+    def set(self, name: str, value: int):
+        self.vm.ram[self.__address(name)] = signed(value & 0xFFFF)
+
+    def __address(self, name: str) -> int:
+        ram = self.vm.ram
+        if name in vm_pointers:
+            return vm_pointers[name]
+        part, index = parse_state(name)
+        if index is None:
+            raise TestException(f'Unknown variable `{name}`.')
+        if part == 'RAM':
+            return index
+        if part == 'temp':
+            return 5 + index
+        if part in vm_pointers:
+            return ram[vm_pointers[part]] + index
+        raise TestException(f'Unknown variable `{name}`.')
+
+    def step(self, command: str, count: int = 1):
+        if command != 'vmstep':
+            raise TestException(f'Unknown command `{command}`.')
+        self.vm.run(count)
+
+    def snapshot(self) -> Optional[Tuple]:
+        return self.vm.pc, self.vm.ram.tobytes()
+
+
+def compile_jack_class(fname: str, text: str) -> str:
+    try:
+        return compile_jack(text)
+    except Exception as e:
+        raise TestException(f'{os.path.basename(fname)}: {e}')
+
+
+def load_backend(fname: Optional[str], path: str, models: Collection[str] = (),
+                 cache_tos: bool = False) -> Backend:
+    """Returns backend for the file a script loads, relative to its directory.
+    Without a file, the VM files of the directory are loaded. `models` are the
+    parts of a chip to simulate by behavioral models, and `cache_tos` builds
+    VM code with the top of stack cached in D.
+    """
+    fname = os.path.join(path, fname) if fname else path
+    ext = os.path.splitext(fname)[1]
+    if ext == '.hdl':
+        return HDLBackend(fname, models)
+    if ext in ['.asm', '.hack']:
+        return CPUBackend(fname, cache_tos)
+    if ext == '.vm' or os.path.isdir(fname):
+        return VMBackend(fname)
+    raise TestException(f'Cannot load `{fname}`.')
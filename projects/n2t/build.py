@@ -0,0 +1,172 @@
+import io
+import os
+import json
+from typing import Dict, Iterable, List
+from cache import BuildCache, cache_key
+from tools import load_tool, tool_version
+
+compiler = load_tool('compiler', ['engine'])
+translator = load_tool('translator', ['parse', 'writer', 'optimize', 'translator'])
+assembler = load_tool('assembler', ['parse', 'code'])
+
+
+class BuildException(Exception):
+    pass
+
+
+def write_file(path: str, text: str):
+    """Replaces file with text at once, leaving it untouched if unchanged.
+    """
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            if f.read() == text:
+                return
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def compile_jack(text: str) -> str:
+    """Compiles Jack class to VM code.
+    """
+    c = compiler['engine'].CompilationEngine(in_f=io.StringIO(text), out_f=None)
+    c.compile_class()
+    return c.getvalue()
+
+
+def translate_vm(fname: str, text: str, shared: bool, cached: bool) -> Dict:
+    """Translates VM code of file `fname` to an ASM fragment with the shared
+    routines it uses and whether it holds the bootstrap code.
+    """
+    w = translator['writer'].CodeWriter(None, shared, cached)
+    w.fname = fname
+    p = translator['parse'].Parser(text.splitlines())
+    while p.has_more:
+        p.advance()
+        translator['translator'].write_command(w, p)
+    # The fragment may be linked after code that does not expect TOS in D
+    w.flush()
+    return {
+        'asm': w.asm,
+        'routines': sorted(w.used_routines),
+        'has_init': w.has_init,
+        'init_len': w.init_len,
+    }
+
+
+def link(fragments: List[Dict], optimized: bool, shared: bool, cached: bool) -> List[str]:
+    """Joins ASM fragments behind the bootstrap code and adds shared routines.
+    """
+    w = translator['writer'].CodeWriter(None, shared, cached)
+    # Bootstrap is at the start of its fragment and has to start the ROM
+    for fragment in sorted(fragments, key=lambda f: not f['has_init']):
+        w.asm += fragment['asm']
+        w.used_routines.update(fragment['routines'])
+        if fragment['has_init'] and not w.has_init:
+            w.has_init = True
+            w.init_len = fragment['init_len']
+    w.write_routines()
+    if optimized:
+        w.asm = translator['optimize'].optimize(w.asm)
+    return w.asm
+
+
+def assemble(name: str, asm_lines: Iterable[str]) -> str:
+    """Assembles ASM program `name` to text machine code.
+    """
+    p = assembler['parse'].Parser(f'{name}.asm')
+    p.parse(asm_lines)
+    words = assembler['code'].assemble_words(p.lines, p.sym_table)
+    out_f = io.BytesIO()
+    assembler['code'].write_words(words, out_f, assembler['code'].Format.HACK)
+    return out_f.getvalue().decode()
+
+
+def build(path: str, optimized: bool = False, shared: bool = False,
+          cached: bool = False, use_cache: bool = True, keep: bool = False) -> BuildCache:
+    """Compiles Jack files in directory `path`, translates the result together
+    with any VM files that have no Jack source, and assembles the program to
+    `<dir>.hack`. Code is passed between the tools in memory, and the `.vm`
+    files of Jack sources and `<dir>.asm` are only written if `keep` is set.
+
+    Compiled VM code, per-file ASM fragments, the linked program and machine
+    code are cached by the hash of their inputs and the sources of the tool
+    that made them and of `n2t`, which drives the tools, so only changed files
+    are compiled and translated again.
+    Returns the cache with its hit and miss counts.
+    """
+    cache = BuildCache(path, use_cache)
+    name = os.path.basename(os.path.abspath(path))
+    fnames = sorted(os.listdir(path))
+    errors = []
+    # The functions calling the tools are part of every stage
+    n2t_version = tool_version('n2t')
+
+    # Jack to VM
+    compiler_version = tool_version('compiler')
+    vm_texts = {}
+    for fname in fnames:
+        if not fname.endswith('.jack'):
+            continue
+        with open(os.path.join(path, fname), 'r') as f:
+            text = f.read()
+        base = fname[:-len('.jack')]
+        key = cache_key('compiler', n2t_version, compiler_version, text)
+        vm_text = cache.get(key, 'vm')
+        if vm_text is None:
+            try:
+                vm_text = compile_jack(text)
+            except Exception as e:
+                errors.append(f'{fname}: {e}')
+                continue
+            cache.put(key, 'vm', vm_text)
+        vm_texts[base] = vm_text
+        if keep:
+            write_file(os.path.join(path, f'{base}.vm'), vm_text)
+    if errors:
+        raise BuildException('\n'.join(errors))
+
+    # Hand-written VM files, such as a precompiled OS
+    for fname in fnames:
+        base = fname[:-len('.vm')]
+        if fname.endswith('.vm') and base not in vm_texts:
+            with open(os.path.join(path, fname), 'r') as f:
+                vm_texts[base] = f.read()
+
+    # VM to ASM fragments
+    translator_version = tool_version('translator')
+    fragment_keys = []
+    fragments = []
+    for base in sorted(vm_texts):
+        text = vm_texts[base]
+        key = cache_key('translator', n2t_version, translator_version, str(shared), str(cached),
+                        base, text)
+        fragment = cache.get(key, 'frag')
+        if fragment is None:
+            fragment = json.dumps(translate_vm(base, text, shared, cached))
+            cache.put(key, 'frag', fragment)
+        fragment_keys.append(key)
+        fragments.append(json.loads(fragment))
+
+    # Link, reusing the program if no fragment changed
+    key = cache_key('link', n2t_version, translator_version, str(optimized), str(shared),
+                    str(cached), *fragment_keys)
+    asm_text = cache.get(key, 'asm')
+    if asm_text is None:
+        asm_lines = link(fragments, optimized, shared, cached)
+        asm_text = '\n'.join(asm_lines) + '\n'
+        cache.put(key, 'asm', asm_text)
+    else:
+        asm_lines = asm_text.splitlines()
+    if keep:
+        write_file(os.path.join(path, f'{name}.asm'), asm_text)
+
+    # ASM to machine code
+    key = cache_key('assembler', n2t_version, tool_version('assembler'), asm_text)
+    hack_text = cache.get(key, 'hack')
+    if hack_text is None:
+        hack_text = assemble(name, asm_lines)
+        cache.put(key, 'hack', hack_text)
+    write_file(os.path.join(path, f'{name}.hack'), hack_text)
+    return cache
@@ -0,0 +1,55 @@
+import os
+import hashlib
+from collections import Counter
+from typing import Optional
+
+CACHE_DIR = '.n2tcache'
+
+
+def cache_key(*parts: str) -> str:
+    """Returns hash identifying a build product by everything it depends on.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode() + b'\0')
+    return h.hexdigest()
+
+
+class BuildCache:
+    """Content-addressed store of build products, one file per key in the
+    `.n2tcache` directory of a project.
+    """
+
+    def __init__(self, path: str, enabled: bool = True):
+        self.root = os.path.join(path, CACHE_DIR)
+        self.enabled = enabled
+        # Counts by product extension
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """Returns cached product or None.
+        """
+        if self.enabled:
+            try:
+                with open(os.path.join(self.root, f'{key}.{ext}'), 'r') as f:
+                    text = f.read()
+                self.hits[ext] += 1
+                return text
+            except FileNotFoundError:
+                pass
+        self.misses[ext] += 1
+        return None
+
+    def put(self, key: str, ext: str, text: str):
+        """Stores product, replacing the file at once so readers never see
+        partial entries.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f'{key}.{ext}')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
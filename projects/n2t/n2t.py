@@ -0,0 +1,73 @@
+import os
+import argparse
+from build import BuildException, build
+from runner import find_tests, run_tests
+from tools import projects_dir
+
+# Build products by cache file extension
+stages = {
+    'vm': 'compile',
+    'frag': 'translate',
+    'asm': 'link',
+    'hack': 'assemble',
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Nand2tetris toolchain driver.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser(
+        'build', help='Compile, translate and assemble a program directory.')
+    build_parser.add_argument('input', help='Path of the program directory.')
+    build_parser.add_argument('--optimize', action='store_true',
+                              help='Run peephole optimizer on the generated ASM.')
+    build_parser.add_argument('--shared', action='store_true',
+                              help='Emit call, return and comparisons as shared routines.')
+    build_parser.add_argument('--cache-tos', action='store_true',
+                              help='Keep the top of the stack in D between commands.')
+    build_parser.add_argument('--no-cache', action='store_true',
+                              help='Rebuild everything without reading or writing .n2tcache.')
+    build_parser.add_argument('--keep', action='store_true',
+                              help='Also write the intermediate .vm and .asm files.')
+
+    test_parser = subparsers.add_parser(
+        'test', help='Run .tst scripts and compare their output to the .cmp files.')
+    test_parser.add_argument('paths', nargs='*', default=[projects_dir],
+                             help='Scripts, or directories to search for them. Defaults to all projects.')
+    test_parser.add_argument('-j', '--jobs', type=int, default=None,
+                             help='Number of processes. Defaults to the number of CPUs.')
+    test_parser.add_argument('--out', action='store_true',
+                             help='Write the .out files named by the scripts.')
+    test_parser.add_argument('--gate-level', action='store_true',
+                             help='Simulate chips down to gates instead of using behavioral models '
+                                  'of parts that pass their own tests.')
+    test_parser.add_argument('--cache-tos', action='store_true',
+                             help='Translate VM files run on the CPU emulator with the top of stack '
+                                  'cached in D, as `build --cache-tos` does.')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            cache = build(args.input, args.optimize, args.shared, args.cache_tos,
+                          not args.no_cache, args.keep)
+        except BuildException as e:
+            print(f'error: {e}')
+            exit(1)
+        for ext, stage in stages.items():
+            print(f'{stage}: {cache.hits[ext]} cached, {cache.misses[ext]} built')
+
+    elif args.command == 'test':
+        counts = {'PASS': 0, 'FAIL': 0, 'SKIP': 0}
+        fnames = find_tests(args.paths)
+        for fname, status, reason, seconds in run_tests(fnames, args.jobs, args.out,
+                                                        args.gate_level, args.cache_tos):
+            name = os.path.relpath(fname, projects_dir)
+            counts[status] += 1
+            if reason is None:
+                print(f'{status} {name} ({seconds:.2f} s)')
+            else:
+                print(f'{status} {name} ({seconds:.2f} s): {reason}')
+        print(f'{counts["PASS"]} passed, {counts["FAIL"]} failed, {counts["SKIP"]} skipped')
+        if counts['FAIL']:
+            exit(1)
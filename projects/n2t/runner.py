@@ -0,0 +1,234 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from backends import Backend, hdl, load_backend
+from script import (Block, Column, Statement, TestException, TestSkipped, compare_ops, matches,
+                    parse_script, parse_value)
+
+# Iterations a `while` loop or endless `repeat` may run before the test fails
+MAX_ITERATIONS = 100_000
+
+# Whether the test script of each HDL file passed, for chips with models
+verified: Dict[str, bool] = {}
+
+
+def is_verified(hdl_fname: str) -> bool:
+    """Whether chip passes the test script next to its HDL file.
+    """
+    hdl_fname = os.path.abspath(hdl_fname)
+    if hdl_fname not in verified:
+        tst_fname = os.path.splitext(hdl_fname)[0] + '.tst'
+        verified[hdl_fname] = os.path.exists(tst_fname) and run_test(tst_fname)[1] == 'PASS'
+    return verified[hdl_fname]
+
+
+def verified_models(hdl_fname: str) -> List[str]:
+    """Returns parts of a chip, at any depth, to simulate by their behavioral
+    models: those whose own test script passes, itself run with the models of
+    verified parts. Parts inside a modeled part are not looked at.
+    """
+    netlist = hdl['netlist']
+    library = netlist.ChipLibrary(netlist.default_search_path(hdl_fname))
+    models = []
+    seen = set()
+    names = [os.path.splitext(os.path.basename(hdl_fname))[0]]
+    try:
+        while names:
+            for part in library.load(names.pop()).parts:
+                chip = library.load(part.name)
+                if chip.name in seen:
+                    continue
+                seen.add(chip.name)
+                fname = library.find(chip.name)
+                if chip.name in hdl['models'].model_chips and fname and is_verified(fname):
+                    models.append(chip.name)
+                else:
+                    names.append(chip.name)
+    except hdl['parse'].HDLException:
+        # Reported when the chip is loaded
+        return []
+    return models
+
+
+class TestRunner:
+    """Runs a test script against the simulator it loads, comparing each
+    output line with the compare file as soon as it is written.
+    """
+
+    def __init__(self, fname: str, write_out: bool = False, gate_level: bool = False,
+                 cache_tos: bool = False):
+        self.fname = fname
+        self.path = os.path.dirname(os.path.abspath(fname))
+        self.write_out = write_out
+        self.gate_level = gate_level
+        self.cache_tos = cache_tos
+        self.backend: Optional[Backend] = None
+        self.columns: List[Column] = []
+        self.out_fname = None
+        self.out_lines: List[str] = []
+        self.cmp_lines: Optional[List[str]] = None
+
+    def run(self):
+        """Runs the script. Raises TestException on errors and the first line
+        that differs from the compare file.
+        """
+        try:
+            self.run_statements(parse_script(self.fname))
+            if self.cmp_lines is not None and len(self.out_lines) < len(self.cmp_lines):
+                raise TestException(
+                    f'Output ended at line {len(self.out_lines) + 1}, '
+                    f'expected `{self.cmp_lines[len(self.out_lines)].rstrip()}`.')
+        finally:
+            if self.write_out and self.out_fname is not None:
+                with open(self.out_fname, 'w') as f:
+                    f.write(''.join(f'{line}\n' for line in self.out_lines))
+
+    def run_statements(self, statements: List[Statement]):
+        for statement in statements:
+            if isinstance(statement, Block):
+                self.run_block(statement)
+            else:
+                self.run_command(statement)
+
+    def run_block(self, block: Block):
+        body = block.body
+        # A loop of a single step is run by the simulator itself
+        fast = (len(body) == 1 and isinstance(body[0], list) and len(body[0]) == 1
+                and body[0][0] in self.__backend().steps)
+
+        if block.header[0] == 'repeat' and len(block.header) == 2:
+            count = parse_value(block.header[1])
+            if fast:
+                self.backend.step(body[0][0], count)
+                return
+            for _ in range(count):
+                self.run_statements(body)
+            return
+
+        loop = ' '.join(block.header)
+        if block.header[0] == 'repeat':
+            # Runs until the user stops the script
+            raise TestSkipped(f'Loop `{loop}` never ends, the script is run by hand.')
+        for _ in range(MAX_ITERATIONS):
+            if not self.condition(block.header[1:]):
+                return
+            before = self.backend.snapshot()
+            self.run_statements(body)
+            if before is not None and self.backend.snapshot() == before:
+                # Every later iteration is the same, only the user can end the loop
+                if self.backend.has_keyboard:
+                    raise TestSkipped(f'Loop `{loop}` waits for a key to be pressed.')
+                raise TestException(f'Loop `{loop}` never ends.')
+        raise TestException(f'Loop `{" ".join(block.header)}` ran {MAX_ITERATIONS} times.')
+
+    def condition(self, words: List[str]) -> bool:
+        if len(words) != 3 or words[1] not in compare_ops:
+            raise TestException(f'Invalid condition `{" ".join(words)}`.')
+        return compare_ops[words[1]](self.__value(words[0]), self.__value(words[2]))
+
+    def run_command(self, words: List[str]):
+        command = words[0]
+        if command == 'load':
+            fname = words[1] if len(words) > 1 else None
+            models = []
+            if fname is not None and fname.endswith('.hdl') and not self.gate_level:
+                models = verified_models(os.path.join(self.path, fname))
+            self.backend = load_backend(fname, self.path, models, self.cache_tos)
+        elif command == 'output-file':
+            self.out_fname = os.path.join(self.path, words[1])
+        elif command == 'compare-to':
+            with open(os.path.join(self.path, words[1]), 'r') as f:
+                self.cmp_lines = f.read().splitlines()
+        elif command == 'output-list':
+            self.columns = [Column(word) for word in words[1:]]
+            self.output('|' + '|'.join(column.header() for column in self.columns) + '|')
+        elif command == 'output':
+            self.output('|' + '|'.join(column.format(self.__value(column.name))
+                                       for column in self.columns) + '|')
+        elif command == 'set':
+            if len(words) != 3:
+                raise TestException(f'Invalid command `{" ".join(words)}`.')
+            self.__backend().set(words[1], parse_value(words[2]))
+        elif command in ['echo', 'clear-echo', 'breakpoint', 'clear-breakpoints']:
+            pass
+        elif len(words) == 3 and words[1] == 'load':
+            self.__backend().load_memory(words[0], os.path.join(self.path, words[2]))
+        else:
+            self.__backend().step(command)
+
+    def output(self, line: str):
+        """Adds output line, checking it against the compare file.
+        """
+        n = len(self.out_lines)
+        self.out_lines.append(line)
+        if self.cmp_lines is None:
+            return
+        if n >= len(self.cmp_lines):
+            raise TestException(f'Line {n + 1} is not in the compare file: `{line}`.')
+        if not matches(self.cmp_lines[n], line):
+            raise TestException(
+                f'Comparison failure at line {n + 1}:\n'
+                f'  expected `{self.cmp_lines[n].rstrip()}`\n'
+                f'  got      `{line}`')
+
+    def __value(self, name: str):
+        if name == 'time':
+            return self.__backend().time
+        if name.lstrip('-').isdigit() or name.startswith('%'):
+            return parse_value(name)
+        return self.__backend().get(name)
+
+    def __backend(self) -> Backend:
+        if self.backend is None:
+            raise TestException('No file loaded.')
+        return self.backend
+
+
+def run_test(fname: str, write_out: bool = False, gate_level: bool = False,
+             cache_tos: bool = False) -> Tuple[str, str, Optional[str], float]:
+    """Runs test script. Returns its name, `PASS`, `FAIL` or `SKIP` for
+    scripts that need a user, the reason if it did not pass, and the seconds
+    taken.
+    """
+    start = time.perf_counter()
+    status = 'FAIL'
+    try:
+        TestRunner(fname, write_out, gate_level, cache_tos).run()
+        status, reason = 'PASS', None
+    except TestSkipped as e:
+        status, reason = 'SKIP', str(e)
+    except TestException as e:
+        reason = str(e)
+    except Exception as e:
+        reason = f'{type(e).__name__}: {e}'
+    return fname, status, reason, time.perf_counter() - start
+
+
+def find_tests(paths: List[str]) -> List[str]:
+    """Returns test scripts given directly or found under directories.
+    """
+    fnames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, files in os.walk(path):
+                dirnames.sort()
+                fnames.extend(os.path.join(dirpath, f) for f in sorted(files) if f.endswith('.tst'))
+        else:
+            fnames.append(path)
+    return fnames
+
+
+def run_tests(fnames: List[str], jobs: Optional[int] = None, write_out: bool = False,
+              gate_level: bool = False,
+              cache_tos: bool = False) -> Iterator[Tuple[str, str, Optional[str], float]]:
+    """Runs test scripts on `jobs` processes, all cores by default. Yields
+    results in the order of the scripts.
+    """
+    if jobs == 1:
+        for fname in fnames:
+            yield run_test(fname, write_out, gate_level, cache_tos)
+        return
+    with ProcessPoolExecutor(jobs) as executor:
+        yield from executor.map(run_test, fnames, [write_out] * len(fnames),
+                                [gate_level] * len(fnames), [cache_tos] * len(fnames))
@@ -0,0 +1,180 @@
+import re
+from typing import List, Optional, Union
+
+token_re = re.compile(r'''
+    (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+    |(?P<string>"[^"]*")
+    |(?P<symbol>[,;{}])
+    |(?P<word>[^\s,;{}"]+)
+''', re.VERBOSE | re.DOTALL)
+
+column_re = re.compile(r'^(?P<name>[^%]+)%(?P<fmt>[BDXS])(?P<pad_left>\d+)\.(?P<width>\d+)\.(?P<pad_right>\d+)$')
+
+# Comparison operators of `while` conditions
+compare_ops = {
+    '=': lambda x, y: x == y,
+    '<>': lambda x, y: x != y,
+    '<': lambda x, y: x < y,
+    '>': lambda x, y: x > y,
+    '<=': lambda x, y: x <= y,
+    '>=': lambda x, y: x >= y,
+}
+
+
+class TestException(Exception):
+    pass
+
+
+class TestSkipped(Exception):
+    """Script that cannot run without a user, such as one waiting for keys.
+    """
+    pass
+
+
+class Block:
+    """`repeat` or `while` loop. `header` holds the words before the brace.
+    """
+
+    def __init__(self, header: List[str], body: List['Statement']):
+        self.header = header
+        self.body = body
+
+
+# Command as its words, or a loop
+Statement = Union[List[str], Block]
+
+
+class Column:
+    """Output list entry `name%Fp.w.q`: the value of `name` in format `F`
+    (binary, decimal, hex or string), `w` characters wide between `p` and `q`
+    spaces.
+    """
+
+    def __init__(self, spec: str):
+        m = column_re.match(spec)
+        if m is None:
+            raise TestException(f'Invalid output column `{spec}`.')
+        self.name = m.group('name')
+        self.fmt = m.group('fmt')
+        self.pad_left = int(m.group('pad_left'))
+        self.width = int(m.group('width'))
+        self.pad_right = int(m.group('pad_right'))
+
+    def header(self) -> str:
+        """Returns name centered in the column, cut to its width.
+        """
+        total = self.pad_left + self.width + self.pad_right
+        name = self.name[:total]
+        left = (total - len(name)) // 2
+        return ' ' * left + name + ' ' * (total - len(name) - left)
+
+    def format(self, value: Union[int, str]) -> str:
+        """Returns padded text of a value. Integers are signed 16-bit values,
+        or unsigned for narrower pins.
+        """
+        if self.fmt == 'S':
+            text = str(value).ljust(self.width)
+        elif self.fmt == 'D':
+            text = str(value).rjust(self.width)
+        elif self.fmt == 'B':
+            text = format(value & ((1 << self.width) - 1), f'0{self.width}b')
+        else:
+            text = format(value & 0xFFFF, f'0{self.width}X')[-self.width:]
+        return ' ' * self.pad_left + text + ' ' * self.pad_right
+
+
+def parse_value(text: str) -> int:
+    """Parses `%B`, `%X` or `%D` prefixed or plain decimal value.
+    """
+    try:
+        if text.startswith('%B'):
+            value = int(text[2:], 2)
+        elif text.startswith('%X'):
+            value = int(text[2:], 16)
+        elif text.startswith('%D'):
+            return int(text[2:])
+        else:
+            return int(text)
+    except ValueError:
+        raise TestException(f'Invalid value `{text}`.')
+    # Binary and hex values are 16-bit words
+    return value - 0x10000 if 0x8000 <= value <= 0xFFFF else value
+
+
+def matches(expected: str, line: str) -> bool:
+    """Whether output line matches compare file line, in which `*` matches
+    any character.
+    """
+    expected = expected.rstrip()
+    line = line.rstrip()
+    return len(expected) == len(line) and all(
+        e == '*' or e == c for e, c in zip(expected, line))
+
+
+class Parser:
+    """Test script parser. Commands end with `,` or `;` and loops hold a
+    block of commands in braces.
+    """
+
+    def __init__(self, text: str):
+        self.__tokens = []
+        pos = 0
+        for m in token_re.finditer(text):
+            if m.start() != pos:
+                break
+            pos = m.end()
+            if m.lastgroup != 'skip':
+                self.__tokens.append(m.group())
+        if pos != len(text):
+            raise TestException(f'Invalid character `{text[pos]}`.')
+        self.__pos = 0
+
+    def parse(self) -> List[Statement]:
+        """Parses script into commands and loops.
+        """
+        statements = self.__parse_block()
+        if self.__pos < len(self.__tokens):
+            raise TestException('Unmatched `}`.')
+        return statements
+
+    def __parse_block(self) -> List[Statement]:
+        statements = []
+        words = []
+        while self.__pos < len(self.__tokens):
+            token = self.__tokens[self.__pos]
+            if token == '}':
+                break
+            self.__pos += 1
+            if token in [',', ';']:
+                if words:
+                    statements.append(words)
+                words = []
+            elif token == '{':
+                if not words or words[0] not in ['repeat', 'while']:
+                    raise TestException('Block without `repeat` or `while`.')
+                body = self.__parse_block()
+                if self.__pos == len(self.__tokens):
+                    raise TestException('Missing `}`.')
+                self.__pos += 1
+                statements.append(Block(words, body))
+                words = []
+            else:
+                words.append(token)
+        if words:
+            statements.append(words)
+        return statements
+
+
+def parse_script(fname: str) -> List[Statement]:
+    """Parses test script file.
+    """
+    with open(fname, 'r') as f:
+        return Parser(f.read()).parse()
+
+
+def loop_count(block: Block) -> Optional[int]:
+    """Returns iteration count of a `repeat` block, None if it repeats forever.
+    """
+    if len(block.header) == 1:
+        return None
+    return parse_value(block.header[1])
@@ -0,0 +1,45 @@
+import os
+import sys
+import hashlib
+import importlib
+from types import ModuleType
+from typing import Dict, List
+
+projects_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def tool_modules(tool: str) -> List[str]:
+    """Returns names of the modules in a tool directory.
+    """
+    tool_dir = os.path.join(projects_dir, tool)
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(tool_dir)
+                  if f.endswith('.py'))
+
+
+def load_tool(tool: str, names: List[str]) -> Dict[str, ModuleType]:
+    """Imports modules of a tool directory. Tools share module names such as
+    `parse` and `writer`, so the modules of the tool are removed from
+    `sys.modules` again afterwards and others of the same name restored.
+    """
+    tool_dir = os.path.join(projects_dir, tool)
+    local = tool_modules(tool)
+    saved = {name: sys.modules.pop(name) for name in local if name in sys.modules}
+    sys.path.insert(0, tool_dir)
+    try:
+        modules = {name: importlib.import_module(name) for name in names}
+    finally:
+        sys.path.remove(tool_dir)
+        for name in local:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+    return modules
+
+
+def tool_version(tool: str) -> str:
+    """Returns hash of the sources of a tool directory.
+    """
+    h = hashlib.sha256()
+    for name in tool_modules(tool):
+        with open(os.path.join(projects_dir, tool, f'{name}.py'), 'rb') as f:
+            h.update(name.encode() + b'\0' + f.read() + b'\0')
+    return h.hexdigest()
@@ -0,0 +1,37 @@
+import os
+from typing import Dict, List, Set
+from command import CommandType
+from parse import Parser
+
+
+def build_call_graph(path: str, in_fnames: List[str]) -> Dict[str, Set[str]]:
+    """Maps each function defined in the VM files to the functions it calls.
+    """
+    graph = {}
+    for fname in in_fnames:
+        in_path = os.path.join(path, f'{fname}.vm')
+        with open(in_path, 'r') as in_f:
+            p = Parser(in_f)
+            # Calls outside functions are not part of the graph
+            callees = set()
+            while p.has_more:
+                p.advance()
+                if p.command_type == CommandType.FUNCTION:
+                    callees = graph.setdefault(p.arg1, set())
+                elif p.command_type == CommandType.CALL:
+                    callees.add(p.arg1)
+    return graph
+
+
+def reachable(graph: Dict[str, Set[str]], root: str = 'Sys.init') -> Set[str]:
+    """Returns functions that can be called starting at `root`, including it.
+    Calls to functions missing from the graph are ignored.
+    """
+    found = {root}
+    todo = [root]
+    while todo:
+        for callee in graph.get(todo.pop(), ()):
+            if callee in graph and callee not in found:
+                found.add(callee)
+                todo.append(callee)
+    return found
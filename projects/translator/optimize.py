@@ -0,0 +1,286 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+# Addresses of predefined symbols
+predefined = {
+    'SP': 0,
+    'LCL': 1,
+    'ARG': 2,
+    'THIS': 3,
+    'THAT': 4,
+    **{f'R{i}': i for i in range(16)},
+}
+
+# Memory words that are never accessed through computed addresses, so
+# stores to them can be tracked by symbol
+scratch = {0, 13, 14, 15}
+
+# Base addresses of the segments at fixed locations
+fixed_base = {
+    'R5': 5,
+    'THIS': 3,
+}
+
+push_tail = ['@SP', 'A=M', 'M=D', 'A=A+1', 'D=A', '@SP', 'M=D']
+pop_tail = [
+    '@R13', 'M=D',
+    '@SP', 'A=M', 'A=A-1', 'D=M',
+    '@R13', 'A=M', 'M=D',
+    '@SP', 'A=M', 'A=A-1', 'D=A', '@SP', 'M=D',
+]
+if_head = ['@SP', 'D=M', 'M=D-1', '@SP', 'A=M', 'D=M']
+
+# Adjacent instruction pairs that can be replaced, None drops the second
+pair2repl = {
+    ('D=A', 'A=D'): None,
+    ('A=D', 'D=A'): None,
+    ('M=D', 'D=M'): None,
+    ('D=M', 'M=D'): None,
+    ('M=D', 'A=M'): ['M=D', 'A=D'],
+    ('A=A+1', 'A=A-1'): [],
+    ('A=A-1', 'A=A+1'): [],
+    ('D=D+1', 'D=D-1'): [],
+    ('D=D-1', 'D=D+1'): [],
+    ('A=M', 'A=A+1'): ['A=M+1'],
+    ('A=M', 'A=A-1'): ['A=M-1'],
+    ('A=D', 'A=A+1'): ['A=D+1'],
+    ('A=D', 'A=A-1'): ['A=D-1'],
+    ('D=A+1', 'A=D'): ['AD=A+1'],
+}
+
+# Adjacent pairs that can be replaced if a register is not read afterwards
+pair2dead_repl = {
+    ('@0', 'D=D+A'): ('A', []),
+    ('@0', 'D=A'): ('A', ['D=0']),
+    ('@1', 'D=A'): ('A', ['D=1']),
+    ('D=M', 'A=D'): ('D', ['A=M']),
+    ('D=A', 'A=D+1'): ('D', ['A=A+1']),
+    ('D=A', 'A=D-1'): ('D', ['A=A-1']),
+}
+
+MAX_SCAN = 100
+
+Symbol = Union[int, str]
+
+
+def count_instructions(asm: List[str]) -> int:
+    """Returns number of instructions, not counting labels.
+    """
+    return sum(1 for l in asm if not l.startswith('('))
+
+
+def canonical(symbol: str) -> Symbol:
+    """Returns address of predefined or numeric symbol, otherwise the symbol.
+    """
+    if symbol.isdigit():
+        return int(symbol)
+    return predefined.get(symbol, symbol)
+
+
+def split(instr: str) -> Tuple[str, str, str]:
+    """Splits C-instruction into (dest, comp, jump).
+    """
+    dest, _, rest = instr.rpartition('=')
+    comp, _, jump = rest.partition(';')
+    return dest, comp, jump
+
+
+def is_live(asm: List[str], labels: Dict[str, int], start: int,
+            target: Symbol, a_sym: Optional[Symbol] = None) -> bool:
+    """Whether `target` ('A', 'D' or a scratch address) may be read before it
+    is written by the code starting at `start`, with A holding address `a_sym`
+    if known. Unknown jump targets, the end of the program, loops that never
+    touch a memory target and scans that run too long count as reads.
+    """
+    todo = [(start, a_sym)]
+    # Path that visited each state first, earlier paths all ended in a write
+    seen = {}
+    steps = 0
+    path = 0
+    while todo:
+        pos, a_sym = todo.pop()
+        path += 1
+        while pos < len(asm):
+            if (pos, a_sym) in seen:
+                # Memory is observed while looping forever at the end
+                if seen[(pos, a_sym)] == path and isinstance(target, int):
+                    return True
+                break
+            seen[(pos, a_sym)] = path
+            steps += 1
+            if steps > MAX_SCAN:
+                return True
+
+            instr = asm[pos]
+            pos += 1
+            if instr.startswith('('):
+                continue
+            if instr.startswith('@'):
+                if target == 'A':
+                    break
+                a_sym = canonical(instr[1:])
+                continue
+
+            dest, comp, jump = split(instr)
+            if target == 'D' and 'D' in comp:
+                return True
+            if target == 'A' and ('A' in comp or 'M' in comp or 'M' in dest or jump):
+                return True
+            if 'M' in comp and a_sym == target:
+                return True
+            if target == 'D' and 'D' in dest or target == 'A' and 'A' in dest:
+                break
+            if 'M' in dest and a_sym == target:
+                break
+
+            target_sym = a_sym
+            if 'A' in dest:
+                a_sym = None
+            if jump:
+                if target_sym not in labels:
+                    return True
+                if jump == 'JMP':
+                    pos = labels[target_sym]
+                else:
+                    todo.append((labels[target_sym], a_sym))
+        else:
+            # Memory is still observed when the program runs off the end
+            if isinstance(target, int):
+                return True
+    return False
+
+
+def fuse_push_pop(asm: List[str]) -> List[str]:
+    """Rewrites pops, storing a value pushed right before directly to its
+    destination, and if-gotos to pop the stack with a single instruction.
+    """
+    out = []
+    i = 0
+    n_pop = len(pop_tail)
+    while i < len(asm):
+        # Address calculation of a pop is 2 or 4 instructions long
+        for n_addr in [2, 4]:
+            j = i + n_addr
+            if asm[j:j+n_pop] != pop_tail:
+                continue
+            addr = asm[i:j]
+            if addr[1] not in ['D=A', 'D=M'] or n_addr == 4 and addr[3] != 'D=D+A':
+                continue
+
+            pushed = out[-len(push_tail):] == push_tail
+            if pushed:
+                # Pushed value is still in D
+                del out[-len(push_tail):]
+            else:
+                out += ['@SP', 'AM=M-1', 'D=M']
+
+            if n_addr == 2:
+                # Static variable
+                out += [addr[0], 'M=D']
+            elif addr[1] == 'D=A':
+                # Pointer or temp
+                base = fixed_base[addr[0][1:]] + int(addr[2][1:])
+                out += [f'@{base}', 'M=D']
+            elif int(addr[2][1:]) <= 7:
+                out += [addr[0], 'A=M'] + ['A=A+1']*int(addr[2][1:]) + ['M=D']
+            else:
+                out += ['@R14', 'M=D', *addr, '@R13', 'M=D',
+                        '@R14', 'D=M', '@R13', 'A=M', 'M=D']
+            i = j + n_pop
+            break
+        else:
+            if asm[i:i+len(if_head)] == if_head:
+                out += ['@SP', 'AM=M-1', 'D=M']
+                i += len(if_head)
+            else:
+                out.append(asm[i])
+                i += 1
+    return out
+
+
+def peephole(asm: List[str]) -> Tuple[List[str], bool]:
+    """Single pass removing redundant A loads, register round trips and dead
+    stores. Returns new code and whether anything changed.
+    """
+    labels = {l[1:-1]: i for i, l in enumerate(asm) if l.startswith('(')}
+    out = []
+    changed = False
+    known_a: Optional[Symbol] = None
+    for i, instr in enumerate(asm):
+        if instr.startswith('('):
+            known_a = None
+            out.append(instr)
+            continue
+
+        if instr.startswith('@'):
+            sym = canonical(instr[1:])
+            if sym == known_a or not is_live(asm, labels, i+1, 'A'):
+                changed = True
+                continue
+            known_a = sym
+            out.append(instr)
+            continue
+
+        dest, comp, jump = split(instr)
+        pair = (out[-1], instr) if out else None
+        replace = pair in pair2repl
+        if replace:
+            repl = pair2repl[pair]
+        elif pair in pair2dead_repl:
+            reg, repl = pair2dead_repl[pair]
+            replace = not is_live(asm, labels, i+1, reg)
+        if replace:
+            changed = True
+            if repl is not None:
+                out[-1:] = repl
+                known_a = None
+            continue
+
+        if dest and not jump:
+            dead = True
+            a_sym = None if 'A' in dest else known_a
+            for reg in 'AD':
+                if reg in dest and is_live(asm, labels, i+1, reg, a_sym):
+                    dead = False
+            if 'M' in dest and (known_a not in scratch or 'A' in dest or
+                                is_live(asm, labels, i+1, known_a, known_a)):
+                dead = False
+            if dead:
+                changed = True
+                continue
+
+        if 'A' in dest:
+            known_a = None
+        out.append(instr)
+    return out, changed
+
+
+def compact_pushes(asm: List[str]) -> List[str]:
+    """Rewrites remaining pushes of D to increment SP in place, unless the new
+    SP is read from D or A afterwards.
+    """
+    labels = {l[1:-1]: i for i, l in enumerate(asm) if l.startswith('(')}
+    out = []
+    i = 0
+    while i < len(asm):
+        j = i + len(push_tail)
+        if asm[i:j] == push_tail and not is_live(asm, labels, j, 'D') and \
+                not is_live(asm, labels, j, 'A'):
+            out += ['@SP', 'M=M+1', 'A=M-1', 'M=D']
+            i = j
+        else:
+            out.append(asm[i])
+            i += 1
+    return out
+
+
+def optimize(asm: List[str]) -> List[str]:
+    """Returns optimized copy of translated Hack assembly.
+    """
+    asm = fuse_push_pop(asm)
+    for stage in range(2):
+        changed = True
+        while changed:
+            asm, changed = peephole(asm)
+        if stage == 0:
+            asm = compact_pushes(asm)
+    return asm
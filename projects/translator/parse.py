@@ -1,13 +1,14 @@
-from io import TextIOWrapper
+from typing import Iterable
 from command import CommandType
 
 
 class Parser:
-    """VM code parser
+    """VM code parser. Reads lines from a file or any other iterable of lines.
     """
 
-    def __init__(self, f: TextIOWrapper):
+    def __init__(self, f: Iterable[str]):
         self.f = f
+        self.__lines = iter(f)
         self.command_type = None
         self.arg1 = None
         self.arg2 = None
@@ -18,8 +19,8 @@ class Parser:
         self.arg1 = None
         self.arg2 = None
 
-        line = self.f.readline()
-        if line == '':
+        line = next(self.__lines, None)
+        if line is None:
             self.has_more = False
             return
         self.__parse_line(line)
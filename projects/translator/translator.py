@@ -2,16 +2,68 @@ import os
 import argparse
 from typing import List
 from command import CommandType
+from link import build_call_graph, reachable
+from optimize import count_instructions, optimize
 from parse import Parser
 from writer import CodeWriter
 
 
-def translate(path: str, in_fnames: List[str], out_fname: str):
+def write_command(w: CodeWriter, p: Parser):
+    """Writes translation of the command last read by the parser.
+    """
+    if p.command_type == CommandType.ARITHMETIC:
+        w.write_arithmetic(p.arg1)
+    elif p.command_type == CommandType.PUSH or p.command_type == CommandType.POP:
+        w.write_pushpop(p.command_type, p.arg1, p.arg2)
+    elif p.command_type == CommandType.LABEL:
+        w.write_label(p.arg1)
+    elif p.command_type == CommandType.GOTO:
+        w.write_goto(p.arg1)
+    elif p.command_type == CommandType.IF:
+        w.write_if(p.arg1)
+    elif p.command_type == CommandType.FUNCTION:
+        w.curr_func_name = p.arg1
+        if p.arg1 == 'Sys.init':
+            w.write_init()
+        w.write_function(p.arg1, p.arg2)
+    elif p.command_type == CommandType.CALL:
+        w.write_call(p.arg1, p.arg2)
+    elif p.command_type == CommandType.RETURN:
+        w.write_return()
+
+
+def translate(path: str, in_fnames: List[str], out_fname: str,
+              optimized: bool = False, shared: bool = False, cached: bool = False,
+              linked: bool = False):
     """Translate list of VM files in directory `path` to an ASM file.
+    Runs peephole optimizer on the generated code if `optimized` is set and
+    emits call, return and comparisons as shared routines if `shared` is set.
+    Keeps the top of the stack in D between commands if `cached` is set.
+    Drops functions that cannot be reached from `Sys.init` if `linked` is set.
     """
+    keep = None
+    if linked:
+        graph = build_call_graph(path, in_fnames)
+        if 'Sys.init' in graph:
+            keep = reachable(graph)
+    # Translated size of dropped functions
+    dropped = {}
+
     out_path = os.path.join(path, f'{out_fname}.asm')
     with open(out_path, 'w') as out_f:
-        w = CodeWriter(out_f)
+        w = CodeWriter(out_f, shared, cached)
+        func_name = None
+        func_start = 0
+        func_routines = set()
+
+        def drop_function():
+            # Remove code of the current function if it is unreachable
+            if keep is None or func_name is None or func_name in keep:
+                return
+            dropped[func_name] = count_instructions(w.asm[func_start:])
+            del w.asm[func_start:]
+            w.used_routines = func_routines
+
         for fname in in_fnames:
             w.fname = fname
             in_path = os.path.join(path, f'{fname}.vm')
@@ -19,26 +71,24 @@ def translate(path: str, in_fnames: List[str], out_fname: str):
                 p = Parser(in_f)
                 while p.has_more:
                     p.advance()
-                    if p.command_type == CommandType.ARITHMETIC:
-                        w.write_arithmetic(p.arg1)
-                    elif p.command_type == CommandType.PUSH or p.command_type == CommandType.POP:
-                        w.write_pushpop(p.command_type, p.arg1, p.arg2)
-                    elif p.command_type == CommandType.LABEL:
-                        w.write_label(p.arg1)
-                    elif p.command_type == CommandType.GOTO:
-                        w.write_goto(p.arg1)
-                    elif p.command_type == CommandType.IF:
-                        w.write_if(p.arg1)
-                    elif p.command_type == CommandType.FUNCTION:
-                        p.curr_func_name = p.arg1
-                        if p.arg1 == 'Sys.init':
-                            w.write_init()
-                        w.write_function(p.arg1, p.arg2)
-                    elif p.command_type == CommandType.CALL:
-                        w.write_call(p.arg1, p.arg2)
-                    elif p.command_type == CommandType.RETURN:
-                        p.curr_func_name = ''
-                        w.write_return()
+                    if p.command_type == CommandType.FUNCTION:
+                        drop_function()
+                        func_name = p.arg1
+                        func_start = len(w.asm)
+                        func_routines = set(w.used_routines)
+                    write_command(w, p)
+            drop_function()
+            func_name = None
+        w.write_routines()
+        if dropped:
+            for name in sorted(dropped):
+                print(f'dropped: {name} ({dropped[name]} words)')
+            print(f'dropped {len(dropped)} functions, '
+                  f'saved {sum(dropped.values())} ROM words')
+        if optimized:
+            before = count_instructions(w.asm)
+            w.asm = optimize(w.asm)
+            print(f'instructions: {before} -> {count_instructions(w.asm)}')
         # Output
         w.output()
 
@@ -48,6 +98,14 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(
         description='Translate VM code to HACK ASM.')
     parser.add_argument('input', help='Path of the directory/file.')
+    parser.add_argument('--optimize', action='store_true',
+                        help='Run peephole optimizer on the generated ASM.')
+    parser.add_argument('--shared', action='store_true',
+                        help='Emit call, return and comparisons as shared routines.')
+    parser.add_argument('--cache-tos', action='store_true',
+                        help='Keep the top of the stack in D between commands.')
+    parser.add_argument('--link', action='store_true',
+                        help='Drop functions that cannot be reached from Sys.init.')
 
     args = parser.parse_args()
     path = os.path.dirname(args.input)
@@ -70,4 +128,5 @@ if __name__ == '__main__':
         in_fnames.append(fname)
         out_fname = fname
 
-    translate(path, in_fnames, out_fname)
+    translate(path, in_fnames, out_fname, args.optimize, args.shared,
+              args.cache_tos, args.link)
@@ -7,12 +7,21 @@ class CodeWriter:
     """Translates VM code to Hack assembly.
     """
 
-    def __init__(self, f: TextIOWrapper):
+    def __init__(self, f: TextIOWrapper, shared: bool = False, cached: bool = False):
         self.f = f
         self.fname = ''
         self.label_counters = {}
         self.curr_func_name = ''
         self.asm = []
+        # Call, return and comparisons jump to routines emitted once
+        self.shared = shared
+        self.used_routines = set()
+        self.has_init = False
+        # Words of the bootstrap code, which shared routines are placed after
+        self.init_len = 0
+        # Top of stack is kept in D instead of RAM while `tos_in_d` is set
+        self.cached = cached
+        self.tos_in_d = False
 
     def output(self):
         """Output ASM to file.
@@ -22,7 +31,9 @@ class CodeWriter:
     def write_arithmetic(self, command: str):
         """Writes translated arithmetic instruction.
         """
-        if command in ['neg', 'not']:
+        if self.cached:
+            self.__write_cached_arithmetic(command)
+        elif command in ['neg', 'not']:
             # Unary command: set M=x
             self.asm += [
                 '@SP',
@@ -34,6 +45,9 @@ class CodeWriter:
                 '@SP',
                 'M=D',
             ]
+        elif command in ['eq', 'gt', 'lt'] and self.shared:
+            # Comparison routine pops both operands and pushes the result
+            self.asm += self.__jump_to_routine(f'__{command.upper()}')
         elif command in ['add', 'sub', 'eq', 'gt', 'lt', 'and', 'or']:
             # Binary command: set D=x and M=y
             self.asm += [
@@ -52,6 +66,10 @@ class CodeWriter:
     def write_pushpop(self, command: CommandType, segment: str, index: int):
         """Writes translated push or pop instruction.
         """
+        if self.cached:
+            self.__write_cached_pushpop(command, segment, index)
+            return
+
         # Pushing constant
         if segment == 'constant' and command == CommandType.PUSH:
             self.asm += [
@@ -135,20 +153,24 @@ class CodeWriter:
         """Writes system init into beginning of ROM.
         """
         # Set SP=256 and call `Sys.init` using `Sys.preinit` as a proxy
-        self.asm = [
+        self.has_init = True
+        bootstrap = [
             '@256',
             'D=A',
             '@SP',
             'M=D',
             '@Sys.preinit',
             '0;JMP',
-        ] + self.asm
+        ]
+        self.init_len = len(bootstrap)
+        self.asm = bootstrap + self.asm
         self.write_function('Sys.preinit', 0)
         self.write_call('Sys.init', 0)
 
     def write_label(self, label: str):
         """Writes translated label.
         """
+        self.flush()
         self.asm += [
             f'({self.curr_func_name}:{label})',
         ]
@@ -156,6 +178,7 @@ class CodeWriter:
     def write_goto(self, label: str):
         """Writes translated goto.
         """
+        self.flush()
         self.asm += [
             f'@{self.curr_func_name}:{label}',
             '0;JMP',
@@ -164,6 +187,16 @@ class CodeWriter:
     def write_if(self, label: str):
         """Writes translated if-goto.
         """
+        if self.cached:
+            if not self.tos_in_d:
+                self.asm += self.__compile_load()
+            self.tos_in_d = False
+            self.asm += [
+                f'@{self.curr_func_name}:{label}',
+                'D;JNE',
+            ]
+            return
+
         self.asm += [
             '@SP',
             'D=M',
@@ -178,6 +211,22 @@ class CodeWriter:
     def write_call(self, function_name: str, num_args: int):
         """Writes translated function call.
         """
+        self.flush()
+        if self.shared:
+            # Pass function in R13 and offset of ARG from SP in R14
+            self.asm += [
+                f'@{num_args + 5}',
+                'D=A',
+                '@R14',
+                'M=D',
+                f'@{function_name}',
+                'D=A',
+                '@R13',
+                'M=D',
+                *self.__jump_to_routine('__CALL'),
+            ]
+            return
+
         ret_label = self.__generate_label('RET')
         # Push return address
         self.asm += [
@@ -229,7 +278,48 @@ class CodeWriter:
     def write_return(self):
         """Write translated return.
         """
-        self.asm += [
+        self.flush()
+        if self.shared:
+            self.used_routines.add('__RETURN')
+            self.asm += [
+                '@__RETURN',
+                '0;JMP',
+            ]
+            return
+
+        self.asm += self.__compile_return()
+
+    def write_routines(self):
+        """Writes shared routines used so far after the bootstrap code, or at
+        the beginning of ROM behind a jump over them without bootstrap.
+        Pushes the cached top of stack left by code outside functions first.
+        """
+        self.flush()
+        routines = []
+        for name in sorted(self.used_routines):
+            routines += [f'({name})']
+            if name == '__CALL':
+                routines += self.__compile_call_routine()
+            elif name == '__RETURN':
+                routines += self.__compile_return()
+            else:
+                routines += self.__compile_compare_routine(name)
+        if not routines:
+            return
+
+        if self.has_init:
+            # Bootstrap jumps to `Sys.preinit` already
+            self.asm[self.init_len:self.init_len] = routines
+        else:
+            self.asm = [
+                '@__START',
+                '0;JMP',
+                *routines,
+                '(__START)',
+            ] + self.asm
+
+    def __compile_return(self) -> List[str]:
+        asm = [
             # Store old LCL
             '@LCL',
             'D=M',
@@ -258,7 +348,7 @@ class CodeWriter:
         ]
         # Restore THAT, THIS, ARG, and LCL
         for reg in ['THAT', 'THIS', 'ARG', 'LCL']:
-            self.asm += [
+            asm += [
                 '@R13',
                 'M=M-1',
                 'A=M',
@@ -267,15 +357,92 @@ class CodeWriter:
                 'M=D',
             ]
         # Jump to return address
-        self.asm += [
+        asm += [
+            '@R14',
+            'A=M',
+            '0;JMP',
+        ]
+        return asm
+
+    def __compile_call_routine(self) -> List[str]:
+        # Return address in D, function in R13 and number of args + 5 in R14
+        asm = []
+        for var in ['D', 'LCL', 'ARG', 'THIS', 'THAT']:
+            if var != 'D':
+                asm += [
+                    f'@{var}',
+                    'D=M',
+                ]
+            asm += [
+                '@SP',
+                'AM=M+1',
+                'A=A-1',
+                'M=D',
+            ]
+        asm += [
+            # Set ARG
             '@R14',
+            'D=M',
+            '@SP',
+            'D=M-D',
+            '@ARG',
+            'M=D',
+            # Set new LCL
+            '@SP',
+            'D=M',
+            '@LCL',
+            'M=D',
+            # Jump to function
+            '@R13',
+            'A=M',
+            '0;JMP',
+        ]
+        return asm
+
+    def __compile_compare_routine(self, name: str) -> List[str]:
+        # Return address in D, result replaces the operands on the stack
+        branch_map = {
+            '__EQ': 'JEQ',
+            '__GT': 'JGT',
+            '__LT': 'JLT',
+        }
+        return [
+            '@R15',
+            'M=D',
+            '@SP',
+            'AM=M-1',
+            'D=M',
+            'A=A-1',
+            'D=M-D',
+            'M=-1',
+            f'@{name}_TRUE',
+            f'D;{branch_map[name]}',
+            '@SP',
+            'A=M-1',
+            'M=0',
+            f'({name}_TRUE)',
+            '@R15',
             'A=M',
             '0;JMP',
         ]
 
+    def __jump_to_routine(self, name: str) -> List[str]:
+        # Passes return address in D
+        self.used_routines.add(name)
+        ret_label = self.__generate_label('RET')
+        return [
+            f'@{ret_label}',
+            'D=A',
+            f'@{name}',
+            '0;JMP',
+            f'({ret_label})',
+        ]
+
     def write_function(self, function_name: str, num_locals: int):
         """Write translated function declaration.
         """
+        # Functions are entered through calls with nothing cached
+        self.flush()
         self.asm += [
             f'({function_name})',
         ]
@@ -290,6 +457,132 @@ class CodeWriter:
                 'M=D',
             ]
 
+    def flush(self):
+        """Pushes the cached top of stack to RAM, as code that follows may not
+        expect it in D.
+        """
+        if self.tos_in_d:
+            self.asm += [
+                '@SP',
+                'AM=M+1',
+                'A=A-1',
+                'M=D',
+            ]
+            self.tos_in_d = False
+
+    def __compile_load(self) -> List[str]:
+        # Pops top of stack from RAM into D
+        return [
+            '@SP',
+            'AM=M-1',
+            'D=M',
+        ]
+
+    def __write_cached_arithmetic(self, command: str):
+        if command in ['neg', 'not']:
+            comp = '-' if command == 'neg' else '!'
+            if self.tos_in_d:
+                self.asm += [f'D={comp}D']
+            else:
+                # Operate in place rather than loading
+                self.asm += [
+                    '@SP',
+                    'A=M-1',
+                    f'M={comp}M',
+                ]
+            return
+
+        # Binary command: y in D, x popped from RAM, result stays in D
+        if not self.tos_in_d:
+            self.asm += self.__compile_load()
+        comp_map = {
+            'add': 'D=D+M',
+            'sub': 'D=M-D',
+            'and': 'D=D&M',
+            'or': 'D=D|M',
+            'eq': 'D=M-D',
+            'gt': 'D=M-D',
+            'lt': 'D=M-D',
+        }
+        self.asm += [
+            '@SP',
+            'AM=M-1',
+            comp_map[command],
+        ]
+        self.tos_in_d = True
+        if command in ['eq', 'gt', 'lt']:
+            iftrue_label = self.__generate_label('IFTRUE')
+            endif_label = self.__generate_label('ENDIF')
+            self.asm += [
+                f'@{iftrue_label}',
+                f'D;J{command.upper()}',
+                'D=0',
+                f'@{endif_label}',
+                '0;JMP',
+                f'({iftrue_label})',
+                'D=-1',
+                f'({endif_label})',
+            ]
+
+    def __write_cached_pushpop(self, command: CommandType, segment: str, index: int):
+        reg_map = {
+            'argument': 'ARG',
+            'local': 'LCL',
+            'this': 'THIS',
+            'that': 'THAT',
+        }
+        base_map = {
+            'pointer': 3,
+            'temp': 5,
+        }
+        # Address of the word, loaded into A
+        if segment in reg_map:
+            # Stepping A is shorter for small indices, adding them needs D
+            max_steps = 1 if command == CommandType.PUSH else 7
+            if index == 0:
+                addr = [f'@{reg_map[segment]}', 'A=M']
+            elif index <= max_steps:
+                addr = [f'@{reg_map[segment]}', 'A=M+1'] + ['A=A+1']*(index-1)
+            else:
+                addr = [f'@{reg_map[segment]}', 'D=M', f'@{index}', 'A=D+A']
+        elif segment in base_map:
+            addr = [f'@{base_map[segment] + index}']
+        elif segment == 'static':
+            addr = [f'@{self.fname}.{index}']
+
+        if command == CommandType.PUSH:
+            self.flush()
+            if segment == 'constant':
+                self.asm += [
+                    f'@{index}',
+                    'D=A',
+                ]
+            else:
+                self.asm += addr + ['D=M']
+            self.tos_in_d = True
+            return
+
+        if not self.tos_in_d:
+            self.asm += self.__compile_load()
+        self.tos_in_d = False
+        if 'D=M' not in addr:
+            self.asm += addr + ['M=D']
+        else:
+            # Address calculation needs D, so keep value in R13
+            self.asm += [
+                '@R13',
+                'M=D',
+                *addr[:-1],
+                'D=D+A',
+                '@R14',
+                'M=D',
+                '@R13',
+                'D=M',
+                '@R14',
+                'A=M',
+                'M=D',
+            ]
+
     def __compile_unary_command(self, command: str) -> List[str]:
         if command == 'neg':
             return [
@@ -352,5 +645,6 @@ class CodeWriter:
             self.label_counters[prefix] = 0
         else:
             self.label_counters[prefix] += 1
-        label = f'{prefix}_{self.label_counters[prefix]}'
+        # Scoped by file so translations of files can be linked together
+        label = f'{self.fname}${prefix}_{self.label_counters[prefix]}'
         return label
@@ -0,0 +1,399 @@
+import os
+import sys
+from array import array
+from typing import Callable, Dict, List, Tuple, Union
+
+# Reuse the VM code parser of the translator
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', 'translator'))
+from command import CommandType  # noqa: E402
+from parse import Parser  # noqa: E402
+
+RAM_SIZE = 0x8000
+STACK_BASE = 256
+STATIC_BASE = 16
+
+# Opcodes of decoded commands, roughly ordered by frequency
+PUSH_SEG = 0
+PUSH_CONST = 1
+PUSH_FIXED = 2
+POP_SEG = 3
+POP_FIXED = 4
+ADD = 5
+SUB = 6
+NEG = 7
+EQ = 8
+GT = 9
+LT = 10
+AND = 11
+OR = 12
+NOT = 13
+IF = 14
+GOTO = 15
+CALL = 16
+NATIVE = 17
+FUNCTION = 18
+RETURN = 19
+
+arithmetic2op = {
+    'add': ADD,
+    'sub': SUB,
+    'neg': NEG,
+    'eq': EQ,
+    'gt': GT,
+    'lt': LT,
+    'and': AND,
+    'or': OR,
+    'not': NOT,
+}
+
+# Binary operations on constants, for finding idle loops
+const_ops = {
+    ADD: lambda x, y: wrap(x + y),
+    SUB: lambda x, y: wrap(x - y),
+    EQ: lambda x, y: -(x == y),
+    GT: lambda x, y: -(x > y),
+    LT: lambda x, y: -(x < y),
+    AND: lambda x, y: x & y,
+    OR: lambda x, y: x | y,
+}
+
+# Segments addressed through a base pointer in RAM
+seg2ptr = {
+    'local': 1,
+    'argument': 2,
+    'this': 3,
+    'that': 4,
+}
+
+# Segments at fixed addresses
+seg2base = {
+    'pointer': 3,
+    'temp': 5,
+}
+
+
+class VMException(Exception):
+    pass
+
+
+def wrap(x: int) -> int:
+    """Wraps integer to signed 16-bit.
+    """
+    return ((x + 0x8000) & 0xFFFF) - 0x8000
+
+
+def new_ram() -> array:
+    """Returns zeroed RAM of signed 16-bit words.
+    """
+    return array('h', bytes(2*RAM_SIZE))
+
+
+class VirtualMachine:
+    """Stack machine executing VM code directly on the Hack memory layout.
+
+    Commands are decoded to (opcode, x, y) tuples with labels and calls
+    resolved to command indices. `natives` maps function names to Python
+    callables that take the arguments as ints and return the result, and
+    take precedence over VM functions of the same name. `ram` can be given to
+    share memory with the natives.
+    """
+
+    def __init__(self, fnames: List[str], natives: Dict[str, Callable] = None,
+                 ram: array = None):
+        self.ram = ram if ram is not None else new_ram()
+        self.pc = 0
+        self.steps = 0
+        self.natives = natives or {}
+        self.program: List[Tuple] = []
+        self.functions: Dict[str, int] = {}
+        self.__labels: Dict[Tuple[str, str], int] = {}
+        self.__statics: Dict[Tuple[str, int], int] = {}
+
+        for fname in fnames:
+            self.__load(fname)
+        self.__link()
+        self.reset()
+
+    def reset(self):
+        """Bootstraps the machine like the translator does: sets SP to 256 and
+        calls Sys.init if it exists, otherwise starts at the first command.
+        """
+        self.pc = 0
+        if 'Sys.init' not in self.functions:
+            return
+
+        # Frame of the bootstrap call, returning past the end of the program
+        ram = self.ram
+        ram[0] = STACK_BASE
+        frame = [len(self.program), 0, 0, 0, 0]
+        ram[STACK_BASE:STACK_BASE+5] = array('h', frame)
+        ram[0] = STACK_BASE + 5
+        ram[1] = STACK_BASE + 5
+        ram[2] = STACK_BASE
+        self.pc = self.functions['Sys.init']
+
+    @property
+    def halted(self) -> bool:
+        """Whether the program has returned from Sys.init, run past its end or
+        reached an idle loop.
+        """
+        if not 0 <= self.pc < len(self.program):
+            return True
+        op, start, idle = self.program[self.pc]
+        return op == GOTO and bool(idle) and self.__is_idle_now(start, self.pc, idle)
+
+    def __load(self, fname: str):
+        """Decodes VM file, leaving label and call targets as names.
+        """
+        file_name = os.path.splitext(os.path.basename(fname))[0]
+        # Labels are scoped to the enclosing function, or the file outside functions
+        scope = file_name
+        program = self.program
+
+        with open(fname, 'r') as f:
+            p = Parser(f)
+            while p.has_more:
+                p.advance()
+                if p.command_type == CommandType.ARITHMETIC:
+                    program.append((arithmetic2op[p.arg1], 0, 0))
+                elif p.command_type == CommandType.PUSH:
+                    program.append(self.__decode_pushpop(
+                        PUSH_SEG, file_name, p.arg1, p.arg2))
+                elif p.command_type == CommandType.POP:
+                    program.append(self.__decode_pushpop(
+                        POP_SEG, file_name, p.arg1, p.arg2))
+                elif p.command_type == CommandType.LABEL:
+                    self.__labels[(scope, p.arg1)] = len(program)
+                elif p.command_type == CommandType.GOTO:
+                    program.append((GOTO, (scope, p.arg1), 0))
+                elif p.command_type == CommandType.IF:
+                    program.append((IF, (scope, p.arg1), 0))
+                elif p.command_type == CommandType.FUNCTION:
+                    scope = p.arg1
+                    self.functions[p.arg1] = len(program)
+                    program.append((FUNCTION, p.arg2, array('h', bytes(2*p.arg2))))
+                elif p.command_type == CommandType.CALL:
+                    program.append((CALL, p.arg1, p.arg2))
+                elif p.command_type == CommandType.RETURN:
+                    program.append((RETURN, 0, 0))
+
+    def __decode_pushpop(self, op: int, file_name: str, segment: str, index: int) -> Tuple:
+        if segment == 'constant':
+            if op == POP_SEG:
+                raise VMException('Cannot pop to constant segment')
+            return (PUSH_CONST, index, 0)
+        if segment in seg2ptr:
+            return (op, seg2ptr[segment], index)
+
+        if segment in seg2base:
+            addr = seg2base[segment] + index
+        elif segment == 'static':
+            # Allocated in order of first appearance like assembler variables
+            key = (file_name, index)
+            if key not in self.__statics:
+                self.__statics[key] = STATIC_BASE + len(self.__statics)
+            addr = self.__statics[key]
+        else:
+            raise VMException(f'Unknown segment: {segment}')
+        return (PUSH_FIXED if op == PUSH_SEG else POP_FIXED, addr, 0)
+
+    def __link(self):
+        """Resolves jump targets to command indices and calls to functions or natives.
+        """
+        program = self.program
+        for i, (op, x, y) in enumerate(program):
+            if op == GOTO or op == IF:
+                if x not in self.__labels:
+                    raise VMException(f'Undefined label: {x[1]} in {x[0]}')
+                target = self.__labels[x]
+                program[i] = (op, target, op == GOTO and self.__idle_locals(target, i))
+            elif op == CALL:
+                if x in self.natives:
+                    program[i] = (NATIVE, self.natives[x], y)
+                elif x in self.functions:
+                    program[i] = (CALL, self.functions[x], y)
+                else:
+                    raise VMException(f'Undefined function: {x}')
+
+    def __idle_locals(self, start: int, end: int) -> Union[bool, Tuple]:
+        """Whether a backward `goto` at `end` closes a loop that only computes
+        on constants and its own locals and arguments, such as `while (true) {}`
+        or the loop of `Sys.halt`. Returns False if not, otherwise the
+        (local index, value) pairs the loop stores, True if none. See
+        `__is_idle_now` for when such a loop is left.
+        """
+        if start > end:
+            return False
+        # Values on the stack, None if read from a local or argument
+        stack = []
+        stores = {}
+        for op, x, y in self.program[start:end]:
+            if op == PUSH_CONST:
+                stack.append(x)
+            elif op == PUSH_SEG and x in (seg2ptr['local'], seg2ptr['argument']):
+                stack.append(None)
+            elif op == POP_SEG and x == seg2ptr['local'] and stack and stack[-1] is not None:
+                stores[y] = stack.pop()
+            elif (op == NEG or op == NOT) and stack:
+                v = stack.pop()
+                stack.append(None if v is None else wrap(-v) if op == NEG else ~v)
+            elif op in const_ops and len(stack) >= 2:
+                w = stack.pop()
+                v = stack.pop()
+                stack.append(None if v is None or w is None else const_ops[op](v, w))
+            elif op == IF and stack and not start <= x <= end:
+                # Leaves the loop, so it cannot skip stores
+                stack.pop()
+            else:
+                return False
+        if stack:
+            return False
+        return tuple(sorted(stores.items())) or True
+
+    def __is_idle_now(self, start: int, end: int, idle: Union[bool, Tuple]) -> bool:
+        """Whether the idle loop `goto` at `end` keeps looping forever if taken
+        now. With the locals holding the values the loop stores, the next
+        iteration is run on a copy of them, and if it does not leave the loop
+        it ends in the state it started from, so every later one is the same.
+        """
+        if idle is True:
+            return True
+        ram = self.ram
+        lcl = ram[1]
+        if any(ram[lcl + index] != value for index, value in idle):
+            return False
+
+        stack = []
+        stored = {}
+        for op, x, y in self.program[start:end]:
+            if op == PUSH_CONST:
+                stack.append(x)
+            elif op == PUSH_SEG:
+                if x == seg2ptr['local'] and y in stored:
+                    stack.append(stored[y])
+                else:
+                    stack.append(ram[ram[x] + y])
+            elif op == POP_SEG:
+                stored[y] = stack.pop()
+            elif op == NEG:
+                stack.append(wrap(-stack.pop()))
+            elif op == NOT:
+                stack.append(~stack.pop())
+            elif op == IF:
+                if stack.pop():
+                    return False
+            else:
+                w = stack.pop()
+                stack.append(const_ops[op](stack.pop(), w))
+        return True
+
+    def run(self, steps: int) -> int:
+        """Executes up to `steps` commands. Returns number of commands executed.
+
+        SP is kept in a local while running and written back to RAM[0] before
+        natives are called and when returning.
+        """
+        program = self.program
+        n_prog = len(program)
+        ram = self.ram
+        pc = self.pc
+        sp = ram[0]
+
+        n = 0
+        while n < steps and 0 <= pc < n_prog:
+            op, x, y = program[pc]
+            n += 1
+            pc += 1
+
+            if op == PUSH_SEG:
+                ram[sp] = ram[ram[x] + y]
+                sp += 1
+            elif op == PUSH_CONST:
+                ram[sp] = x
+                sp += 1
+            elif op == PUSH_FIXED:
+                ram[sp] = ram[x]
+                sp += 1
+            elif op == POP_SEG:
+                sp -= 1
+                ram[ram[x] + y] = ram[sp]
+            elif op == POP_FIXED:
+                sp -= 1
+                ram[x] = ram[sp]
+            elif op <= NOT:
+                if op == NEG:
+                    v = ram[sp-1]
+                    ram[sp-1] = -v if v != -32768 else v
+                    continue
+                if op == NOT:
+                    ram[sp-1] = ~ram[sp-1]
+                    continue
+
+                sp -= 1
+                v = ram[sp-1]
+                w = ram[sp]
+                if op == ADD:
+                    v += w
+                    ram[sp-1] = v if -32768 <= v <= 32767 else wrap(v)
+                elif op == SUB:
+                    v -= w
+                    ram[sp-1] = v if -32768 <= v <= 32767 else wrap(v)
+                elif op == EQ:
+                    ram[sp-1] = -(v == w)
+                elif op == GT:
+                    ram[sp-1] = -(v > w)
+                elif op == LT:
+                    ram[sp-1] = -(v < w)
+                elif op == AND:
+                    ram[sp-1] = v & w
+                else:
+                    ram[sp-1] = v | w
+            elif op == IF:
+                sp -= 1
+                if ram[sp]:
+                    pc = x
+            elif op == GOTO:
+                if y and self.__is_idle_now(x, pc - 1, y):
+                    # Idle loop, nothing changes anymore
+                    pc -= 1
+                    break
+                pc = x
+            elif op == CALL:
+                ram[sp] = pc
+                ram[sp+1] = ram[1]
+                ram[sp+2] = ram[2]
+                ram[sp+3] = ram[3]
+                ram[sp+4] = ram[4]
+                sp += 5
+                ram[2] = sp - 5 - y
+                ram[1] = sp
+                pc = x
+            elif op == NATIVE:
+                ram[0] = sp
+                args = ram[sp-y:sp].tolist()
+                result = x(*args)
+                sp -= y
+                ram[sp] = wrap(result or 0)
+                sp += 1
+            elif op == FUNCTION:
+                if x:
+                    ram[sp:sp+x] = y
+                    sp += x
+            else:
+                # Return
+                frame = ram[1]
+                ret = ram[frame-5]
+                arg = ram[2]
+                ram[arg] = ram[sp-1]
+                sp = arg + 1
+                ram[4] = ram[frame-1]
+                ram[3] = ram[frame-2]
+                ram[2] = ram[frame-3]
+                ram[1] = ram[frame-4]
+                pc = ret
+
+        ram[0] = sp
+        self.pc = pc
+        self.steps += n
+        return n
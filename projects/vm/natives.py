@@ -0,0 +1,239 @@
+from array import array
+from typing import Callable, Dict, List
+from machine import VMException
+
+HEAP_BASE = 2048
+HEAP_END = 0x4000
+ROWS = 23
+COLS = 64
+
+NEW_LINE = 128
+BACKSPACE = 129
+DOUBLE_QUOTE = 34
+
+
+def divide(x: int, y: int) -> int:
+    """Integer division rounding towards zero.
+    """
+    if y == 0:
+        raise VMException('Division by zero')
+    q = abs(x) // abs(y)
+    return q if (x < 0) == (y < 0) else -q
+
+
+def isqrt(x: int) -> int:
+    """Integer part of the square root of non-negative `x`.
+    """
+    if x < 0:
+        raise VMException('Cannot compute square root of a negative number')
+    r = int(x ** 0.5)
+    while r*r > x:
+        r -= 1
+    while (r+1)*(r+1) <= x:
+        r += 1
+    return r
+
+
+class Natives:
+    """Python implementations of the Math, Memory, String and Output classes
+    of the Jack OS, working on the RAM of a virtual machine.
+
+    Strings use the object layout of `12/String.jack` (arr, maxLen, len) so
+    they can be mixed with compiled code. Heap bookkeeping is kept in Python
+    instead of block headers in RAM. Output writes to a text grid of 23 rows
+    by 64 columns instead of drawing on the screen memory map.
+    """
+
+    def __init__(self, ram: array):
+        self.ram = ram
+        self.free: List[List[int]] = []
+        self.blocks: Dict[int, int] = {}
+        self.text: List[bytearray] = []
+        self.row = 0
+        self.col = 0
+        self.memory_init()
+        self.output_init()
+
+    def functions(self) -> Dict[str, Callable]:
+        """Returns map of VM function names to implementations.
+        """
+        return {
+            'Math.init': lambda: 0,
+            'Math.abs': abs,
+            'Math.multiply': lambda x, y: x*y,
+            'Math.divide': divide,
+            'Math.min': min,
+            'Math.max': max,
+            'Math.sqrt': isqrt,
+            'Memory.init': self.memory_init,
+            'Memory.peek': self.ram.__getitem__,
+            'Memory.poke': self.ram.__setitem__,
+            'Memory.alloc': self.alloc,
+            'Memory.deAlloc': self.dealloc,
+            'String.new': self.string_new,
+            'String.dispose': self.string_dispose,
+            'String.length': lambda s: self.ram[s+2],
+            'String.charAt': lambda s, j: self.ram[self.ram[s] + j],
+            'String.setCharAt': lambda s, j, c: self.ram.__setitem__(self.ram[s] + j, c),
+            'String.appendChar': self.string_append_char,
+            'String.eraseLastChar': self.string_erase_last_char,
+            'String.intValue': self.string_int_value,
+            'String.setInt': self.string_set_int,
+            'String.newLine': lambda: NEW_LINE,
+            'String.backSpace': lambda: BACKSPACE,
+            'String.doubleQuote': lambda: DOUBLE_QUOTE,
+            'Output.init': self.output_init,
+            'Output.moveCursor': self.move_cursor,
+            'Output.printChar': self.print_char,
+            'Output.printString': self.print_string,
+            'Output.printInt': lambda i: self.print_text(str(i)),
+            'Output.println': self.println,
+            'Output.backSpace': self.backspace,
+        }
+
+    # Memory
+
+    def memory_init(self):
+        self.free = [[HEAP_BASE, HEAP_END - HEAP_BASE]]
+        self.blocks = {}
+
+    def alloc(self, size: int) -> int:
+        """Allocates block of `size` words with first fit.
+        """
+        if size < 0:
+            raise VMException('Allocated memory size must be positive')
+        size = max(size, 1)
+        for i, (base, length) in enumerate(self.free):
+            if length >= size:
+                if length == size:
+                    del self.free[i]
+                else:
+                    self.free[i] = [base + size, length - size]
+                self.blocks[base] = size
+                return base
+        raise VMException('Heap overflow')
+
+    def dealloc(self, o: int):
+        """Returns block to the free list, merging it with adjacent free blocks.
+        """
+        if o not in self.blocks:
+            raise VMException(f'Cannot deallocate {o}')
+        size = self.blocks.pop(o)
+        free = self.free
+        i = 0
+        while i < len(free) and free[i][0] < o:
+            i += 1
+        free.insert(i, [o, size])
+        if i + 1 < len(free) and o + size == free[i+1][0]:
+            free[i][1] += free.pop(i+1)[1]
+        if i > 0 and free[i-1][0] + free[i-1][1] == o:
+            free[i-1][1] += free.pop(i)[1]
+
+    # String
+
+    def string_new(self, max_len: int) -> int:
+        if max_len < 0:
+            raise VMException('Maximum length must be non-negative')
+        s = self.alloc(3)
+        ram = self.ram
+        ram[s] = self.alloc(max_len) if max_len > 0 else 0
+        ram[s+1] = max_len
+        ram[s+2] = 0
+        return s
+
+    def string_dispose(self, s: int):
+        if self.ram[s+1] > 0:
+            self.dealloc(self.ram[s])
+        self.dealloc(s)
+
+    def string_append_char(self, s: int, c: int) -> int:
+        ram = self.ram
+        length = ram[s+2]
+        if length >= ram[s+1]:
+            raise VMException('String is full')
+        ram[ram[s] + length] = c
+        ram[s+2] = length + 1
+        return s
+
+    def string_erase_last_char(self, s: int):
+        if self.ram[s+2] > 0:
+            self.ram[s+2] -= 1
+
+    def string_int_value(self, s: int) -> int:
+        val = 0
+        neg = False
+        for i, c in enumerate(self.string_chars(s)):
+            if i == 0 and c == ord('-'):
+                neg = True
+            elif ord('0') <= c <= ord('9'):
+                val = val*10 + c - ord('0')
+            else:
+                break
+        return -val if neg else val
+
+    def string_set_int(self, s: int, val: int):
+        digits = str(val).encode()
+        ram = self.ram
+        if len(digits) > ram[s+1]:
+            raise VMException('String is too short for the number')
+        arr = ram[s]
+        ram[arr:arr+len(digits)] = array('h', list(digits))
+        ram[s+2] = len(digits)
+
+    def string_chars(self, s: int) -> List[int]:
+        ram = self.ram
+        arr = ram[s]
+        return ram[arr:arr + ram[s+2]].tolist()
+
+    # Output
+
+    def output_init(self):
+        self.text = [bytearray(b' '*COLS) for _ in range(ROWS)]
+        self.row = 0
+        self.col = 0
+
+    def move_cursor(self, i: int, j: int):
+        if not (0 <= i < ROWS and 0 <= j < COLS):
+            raise VMException(f'Illegal cursor location: {i}, {j}')
+        self.row = i
+        self.col = j
+
+    def print_char(self, c: int):
+        if c == NEW_LINE:
+            self.println()
+        elif c == BACKSPACE:
+            self.backspace()
+        else:
+            # Characters outside the printable range show as a black square
+            self.text[self.row][self.col] = c if 32 <= c < 127 else ord('#')
+            self.col += 1
+            if self.col == COLS:
+                self.println()
+
+    def print_text(self, s: str):
+        for c in s.encode():
+            self.print_char(c)
+
+    def print_string(self, s: int):
+        for c in self.string_chars(s):
+            self.print_char(c)
+
+    def println(self):
+        self.col = 0
+        self.row = (self.row + 1) % ROWS
+
+    def backspace(self):
+        if self.col > 0:
+            self.col -= 1
+        elif self.row > 0:
+            self.row -= 1
+            self.col = COLS - 1
+        self.text[self.row][self.col] = ord(' ')
+
+    def screen_text(self) -> str:
+        """Returns printed text with trailing blanks removed.
+        """
+        lines = [l.decode().rstrip() for l in self.text]
+        while lines and lines[-1] == '':
+            lines.pop()
+        return '\n'.join(lines)
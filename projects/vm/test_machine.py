@@ -0,0 +1,95 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from machine import VirtualMachine
+
+projects_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MAIN_JACK = '''
+class Main {
+    function void main() {
+        do Memory.poke(8000, 7);
+        return;
+    }
+}
+'''
+
+COUNTER_VM = '''
+function Main.main 1
+label LOOP
+push local 0
+push constant 1
+add
+pop local 0
+goto LOOP
+'''
+
+FLAG_VM = '''
+function Sys.init 1
+push constant 0
+pop local 0
+label LOOP
+push local 0
+if-goto OUT
+push constant 1
+pop local 0
+goto LOOP
+label OUT
+push constant 42
+pop static 0
+label END
+goto END
+'''
+
+
+class HaltTest(unittest.TestCase):
+
+    def test_compiled_program_halts(self):
+        with tempfile.TemporaryDirectory() as path:
+            os_dir = os.path.join(projects_dir, '12')
+            for fname in os.listdir(os_dir):
+                if fname.endswith('.jack'):
+                    shutil.copy(os.path.join(os_dir, fname), path)
+            with open(os.path.join(path, 'Main.jack'), 'w') as f:
+                f.write(MAIN_JACK)
+            subprocess.run([sys.executable, os.path.join(projects_dir, 'compiler', 'compiler.py'),
+                            path + os.sep], check=True)
+            vm = VirtualMachine(sorted(os.path.join(path, f) for f in os.listdir(path)
+                                       if f.endswith('.vm')))
+
+        steps = vm.run(1_000_000)
+        self.assertTrue(vm.halted)
+        self.assertLess(steps, 1_000_000)
+        self.assertEqual(vm.ram[8000], 7)
+        # Stays in the loop of Sys.halt
+        self.assertLessEqual(vm.run(1_000_000), 1)
+
+    def test_loop_changing_local_runs(self):
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'Main.vm')
+            with open(fname, 'w') as f:
+                f.write(COUNTER_VM)
+            vm = VirtualMachine([fname])
+        vm.ram[0] = 256
+        vm.ram[1] = 256
+
+        self.assertEqual(vm.run(1000), 1000)
+        self.assertFalse(vm.halted)
+
+    def test_loop_leaving_on_stored_local_runs(self):
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'Sys.vm')
+            with open(fname, 'w') as f:
+                f.write(FLAG_VM)
+            vm = VirtualMachine([fname])
+
+        vm.run(1000)
+        self.assertTrue(vm.halted)
+        self.assertEqual(vm.ram[16], 42)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import argparse
+from typing import List
+from machine import VirtualMachine, new_ram
+from natives import Natives
+
+
+def parse_range(s: str) -> range:
+    """Parses `START:END` (end exclusive) or single address.
+    """
+    if ':' in s:
+        start, end = s.split(':')
+        return range(int(start, 0), int(end, 0))
+    addr = int(s, 0)
+    return range(addr, addr+1)
+
+
+def find_vm_files(paths: List[str]) -> List[str]:
+    """Expands directories to the VM files they contain.
+    """
+    fnames = []
+    for path in paths:
+        if os.path.isdir(path):
+            fnames.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                          if f.endswith('.vm'))
+        elif path.endswith('.vm'):
+            fnames.append(path)
+        else:
+            raise ValueError(f'{path} is not a VM file or directory')
+    return fnames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run VM code.')
+    parser.add_argument('input', nargs='+', help='Paths of VM files/directories.')
+    parser.add_argument('-n', '--steps', type=int, default=10000000,
+                        help='Maximum number of VM commands to execute.')
+    parser.add_argument('--natives', action='store_true',
+                        help='Run Math, Memory, String and Output in Python.')
+    parser.add_argument('--set', action='append', default=[], metavar='ADDR=VALUE',
+                        help='Set RAM word before running.')
+    parser.add_argument('--dump', action='append', default=[], metavar='START:END',
+                        help='Print RAM range after running.')
+
+    args = parser.parse_args()
+
+    ram = new_ram()
+    natives = Natives(ram) if args.natives else None
+    vm = VirtualMachine(find_vm_files(args.input),
+                        natives.functions() if natives else None, ram)
+    for assignment in args.set:
+        addr, value = assignment.split('=')
+        vm.ram[int(addr, 0)] = int(value, 0)
+
+    vm.run(args.steps)
+    print(f'steps: {vm.steps} halted: {vm.halted}')
+
+    if natives is not None and natives.screen_text():
+        print(natives.screen_text())
+
+    for r in args.dump:
+        for addr in parse_range(r):
+            print(f'RAM[{addr}] = {vm.ram[addr]}')